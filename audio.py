@@ -0,0 +1,342 @@
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import wave
+
+from bundle import find_source
+
+FADE_TIME = 0.5
+FADE_STEP = 0.02
+CACHE_DIR = ".audio-cache"
+
+
+class WaveData:
+    # PCM отображается в память один раз; все потоки и эффекты, которые
+    # играют этот файл, читают одни и те же страницы.
+    def __init__(self, data, channels, sample_size, sample_rate):
+        self.data = data
+        self.channels = channels
+        self.sample_size = sample_size
+        self.sample_rate = sample_rate
+        self.block_align = channels * sample_size // 8
+        self.duration = len(data) / (sample_rate * self.block_align)
+
+    @classmethod
+    def open(cls, file_path):
+        with open(file_path, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+            raise ValueError(f"{file_path}: это не WAV")
+
+        fmt = None
+        offset = 12
+        while offset + 8 <= len(data):
+            chunk_id = data[offset:offset + 4]
+            size, = struct.unpack_from('<I', data, offset + 4)
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack_from('<HHIIHH', data, offset + 8)
+            elif chunk_id == b'data':
+                size = min(size, len(data) - offset - 8)
+                samples = memoryview(data)[offset + 8:offset + 8 + size]
+                break
+            offset += 8 + size + (size & 1)
+        else:
+            raise ValueError(f"{file_path}: нет блока data")
+
+        if fmt is None or fmt[0] != 1 or fmt[5] not in (8, 16):
+            raise ValueError(f"{file_path}: поддерживается только PCM 8/16 бит")
+        return cls(samples, fmt[1], fmt[5], fmt[2])
+
+
+def load_media():
+    # pyglet с драйвером звука импортируется только когда нужен. Окна pyglet
+    # не используются, поэтому скрытое GL-окно не создаётся.
+    import pyglet
+    pyglet.options['shadow_window'] = False
+    import pyglet.media
+    return pyglet.media
+
+
+def decode(file_path, cache_dir=CACHE_DIR):
+    # Сжатый файл один раз раскладывается декодером pyglet в PCM WAV на
+    # диске, дальше он отображается в память как обычный WAV.
+    stat = os.stat(file_path)
+    name = f"{os.path.basename(file_path)}-{stat.st_size}-{int(stat.st_mtime)}.wav"
+    cache_path = os.path.join(cache_dir, name)
+    if os.path.exists(cache_path):
+        return cache_path
+
+    source = load_media().load(file_path, streaming=True)
+    audio_format = source.audio_format
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = cache_path + ".tmp"
+    with wave.open(temp_path, 'wb') as writer:
+        writer.setnchannels(audio_format.channels)
+        writer.setsampwidth(audio_format.sample_size // 8)
+        writer.setframerate(audio_format.sample_rate)
+        while True:
+            audio_data = source.get_audio_data(1 << 16)
+            if audio_data is None:
+                break
+            writer.writeframes(audio_data.data)
+    source.delete()
+    os.replace(temp_path, cache_path)
+    return cache_path
+
+
+def load_wave(file_path, cache_dir=CACHE_DIR):
+    try:
+        return WaveData.open(file_path)
+    except ValueError:
+        return WaveData.open(decode(file_path, cache_dir))
+
+
+class AudioEngine:
+    # Весь звук процесса живёт в одном потоке. Поток Tk только кладёт
+    # команды в очередь: play, pause, stop, crossfade и effect.
+    def __init__(self, effects=(), voices=3, min_interval=0.05, fade_time=FADE_TIME, cache_dir=CACHE_DIR,
+                 bundle=None):
+        self.voices = voices
+        self.min_interval = min_interval
+        self.fade_time = fade_time
+        self.cache_dir = cache_dir
+        self.bundle = bundle
+        self.waves = {}
+        self.effects = {}
+        self.last_played = {}
+        self.tracks = {}
+        self.fades = {}
+        self.current = None
+        self.media = None
+        self.stream = None
+        self.backend_time = None
+        self.disabled = False
+
+        self.commands = queue.Queue()
+        for file_path in effects:
+            self.commands.put(('load_effect', file_path))
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def track(self, file_path):
+        return MusicTrack(self, file_path)
+
+    def send(self, *command):
+        # Без звука команды выбрасываются: читать очередь некому.
+        if not self.disabled:
+            self.commands.put(command)
+
+    def play(self, file_path):
+        self.send('play', file_path, self.fade_time)
+
+    def crossfade(self, file_path, duration=None):
+        self.send('play', file_path, self.fade_time if duration is None else duration)
+
+    def pause(self, file_path):
+        self.send('pause', file_path)
+
+    def stop(self, file_path, fade=False):
+        self.send('stop', file_path, self.fade_time if fade else 0.0)
+
+    def effect(self, file_path):
+        self.send('effect', file_path)
+
+    def close(self, timeout=1.0):
+        self.send('close')
+        self.worker.join(timeout)
+
+    def load_backend(self):
+        # Импорт идёт уже в потоке звука, чтобы не задерживать первое окно.
+        start = time.perf_counter()
+        self.media = load_media()
+        from wavestream import WaveStream
+        self.stream = WaveStream
+        self.backend_time = time.perf_counter() - start
+
+    def run(self):
+        try:
+            self.load_backend()
+        except Exception as e:
+            print(f"Звук недоступен: {e}")
+            self.disabled = True
+            while True:
+                try:
+                    self.commands.get_nowait()
+                except queue.Empty:
+                    return
+        while True:
+            try:
+                command = self.commands.get(timeout=FADE_STEP if self.fades else None)
+            except queue.Empty:
+                command = None
+            if command is not None:
+                if command[0] == 'close':
+                    for player in self.tracks.values():
+                        if player is not None:
+                            player.pause()
+                    return
+                try:
+                    getattr(self, 'do_' + command[0])(*command[1:])
+                except Exception as e:
+                    print(f"Ошибка звука: {e}")
+            if self.fades:
+                self.update_fades()
+
+    def exists(self, file_path):
+        if self.bundle is not None and self.bundle.sound(file_path) is not None:
+            return True
+        return os.path.exists(self.resolve(file_path))
+
+    def resolve(self, file_path):
+        return self.bundle.resolve(file_path) if self.bundle is not None else find_source(file_path)
+
+    def wave(self, file_path):
+        wave_data = self.waves.get(file_path)
+        if wave_data is None:
+            entry = self.bundle.sound(file_path) if self.bundle is not None else None
+            if entry is not None:
+                wave_data = WaveData(*entry)
+            else:
+                wave_data = load_wave(self.resolve(file_path), self.cache_dir)
+            self.waves[file_path] = wave_data
+        return wave_data
+
+    def do_load_effect(self, file_path):
+        if file_path in self.effects:
+            return
+        if not self.exists(file_path):
+            print(f"Файл {file_path} не найден!")
+            self.effects[file_path] = None
+            return
+        # Статический источник держит один общий буфер, а каждый плеер
+        # навсегда держит его в очереди, поэтому повтор — это перемотка.
+        try:
+            source = self.media.StaticSource(self.stream(self.wave(file_path), loop=False))
+        except Exception as e:
+            print(f"Ошибка при загрузке звука: {e}")
+            self.effects[file_path] = None
+            return
+        players = []
+        for _ in range(self.voices):
+            player = self.media.Player()
+            player.queue(source)
+            players.append([player, 0.0])
+        self.effects[file_path] = (source, players)
+
+    def do_effect(self, file_path):
+        self.do_load_effect(file_path)
+        if self.effects[file_path] is None:
+            return
+        now = time.monotonic()
+        if now - self.last_played.get(file_path, -self.min_interval) < self.min_interval:
+            return
+        self.last_played[file_path] = now
+
+        source, players = self.effects[file_path]
+        for voice in players:
+            if voice[1] <= now:
+                break
+        else:
+            return
+        voice[1] = now + (source.duration or 0)
+        player = voice[0]
+        player.pause()
+        player.seek(0)
+        player.play()
+
+    def music_player(self, file_path):
+        if file_path in self.tracks:
+            return self.tracks[file_path]
+        if not self.exists(file_path):
+            print(f"Музыкальный файл {file_path} не найден!")
+            self.tracks[file_path] = None
+            return None
+        try:
+            source = self.stream(self.wave(file_path), loop=True)
+        except Exception as e:
+            print(f"Ошибка при загрузке музыки: {e}")
+            self.tracks[file_path] = None
+            return None
+        player = self.media.Player()
+        player.queue(source)
+        self.tracks[file_path] = player
+        return player
+
+    def do_play(self, file_path, fade_time):
+        player = self.music_player(file_path)
+        if player is None:
+            return
+        if self.current not in (None, file_path):
+            self.do_stop(self.current, fade_time)
+        self.current = file_path
+        if player.playing and file_path not in self.fades:
+            return
+        if fade_time and not player.playing:
+            player.volume = 0.0
+            self.fade(file_path, 1.0, fade_time)
+        else:
+            self.fades.pop(file_path, None)
+            player.volume = 1.0
+        player.play()
+
+    def do_pause(self, file_path):
+        player = self.tracks.get(file_path)
+        if player is not None:
+            self.fades.pop(file_path, None)
+            player.pause()
+            player.volume = 1.0
+
+    def do_stop(self, file_path, fade_time=0.0):
+        player = self.tracks.get(file_path)
+        if self.current == file_path:
+            self.current = None
+        if player is None:
+            return
+        if fade_time and player.playing:
+            self.fade(file_path, 0.0, fade_time, stop=True)
+            return
+        self.fades.pop(file_path, None)
+        player.pause()
+        player.seek(0)
+        player.volume = 1.0
+
+    def fade(self, file_path, target, duration, stop=False):
+        player = self.tracks[file_path]
+        self.fades[file_path] = (time.monotonic(), duration, player.volume, target, stop)
+
+    def update_fades(self):
+        now = time.monotonic()
+        for file_path, (start, duration, begin, target, stop) in list(self.fades.items()):
+            player = self.tracks[file_path]
+            progress = min(1.0, (now - start) / duration)
+            player.volume = begin + (target - begin) * progress
+            if progress < 1.0:
+                continue
+            del self.fades[file_path]
+            if stop:
+                self.do_stop(file_path)
+
+
+class MusicTrack:
+    # Лёгкая ручка сцены на общую дорожку движка: только команды.
+    def __init__(self, engine, file_path):
+        self.engine = engine
+        self.file_path = file_path
+        self.playing = False
+
+    def play(self):
+        if not self.playing:
+            self.engine.play(self.file_path)
+            self.playing = True
+
+    def pause(self):
+        if self.playing:
+            self.engine.pause(self.file_path)
+            self.playing = False
+
+    def stop(self, fade=False):
+        self.engine.stop(self.file_path, fade)
+        self.playing = False
@@ -0,0 +1,68 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import Engine, Piece, COLORS, ROTATIONS, WIDTH, HEIGHT
+
+BOARDS = ('empty', 'stacked', 'checkerboard', 'near_full')
+
+I_PIECE = 0
+T_PIECE = 1
+
+
+def filled_cells(name, width, height):
+    if name == 'stacked':
+        # Лесенка в правой половине и «стена» в левой, столбец 0 пуст:
+        # высокий стек без полных строк.
+        for x in range(1, width):
+            top = height // 4 if x < width // 2 else height // 2 + x % 4
+            for y in range(top, height):
+                yield x, y
+    elif name == 'checkerboard':
+        for y in range(height // 4, height):
+            for x in range(width):
+                if (x + y) % 2 == 0:
+                    yield x, y
+    elif name == 'near_full':
+        # Четыре нижние строки заполнены, кроме колодца справа под
+        # вертикальную палку.
+        for y in range(height - 4, height):
+            for x in range(width - 1):
+                yield x, y
+
+
+def make_engine(name, width=WIDTH, height=HEIGHT, seed=1):
+    engine = Engine(width, height, rng=random.Random(seed))
+    load_board(engine, name)
+    return engine
+
+
+def load_board(engine, name):
+    engine.reset()
+    width = engine.width
+    for x, y in filled_cells(name, width, engine.height):
+        engine.rows[y] |= 1 << x
+        engine.colors[y * width + x] = x % len(COLORS) + 1
+        engine.heights[x] = max(engine.heights[x], engine.height - y)
+    for y in range(engine.height):
+        engine.update_window(y)
+    engine.current_piece = spawn_piece(engine, T_PIECE)
+
+
+def spawn_piece(engine, kind, rotation=0, x=None):
+    if x is None:
+        x = engine.width // 2 - ROTATIONS[kind][rotation].width // 2
+    return Piece(kind, rotation, 2, x, -1)
+
+
+def lock_piece(engine, name):
+    # Фигура, которую кладёт merge_piece: на почти полном поле — палка в
+    # колодец (четыре линии), на остальных — T посередине без очистки.
+    if name == 'near_full':
+        piece = spawn_piece(engine, I_PIECE, 1, engine.width - 1)
+    else:
+        piece = spawn_piece(engine, T_PIECE)
+    piece.y += engine.drop_y(ROTATIONS[piece.kind][piece.rotation], piece.x, piece.y) - piece.y
+    return piece
@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+# boards добавляет корень репозитория в sys.path.
+from boards import BOARDS, make_engine, load_board, lock_piece
+
+from engine import FAST_FALL_TICKS, TICK_RATE
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+# Кадр при ускоренном падении: фигура сдвигается каждые FAST_FALL_TICKS тиков.
+FRAME_BUDGET_MS = FAST_FALL_TICKS / TICK_RATE * 1000
+
+
+def measure(op, setup=None, samples=200, inner=100, duration=None):
+    # Быстрые операции меряются пачками по inner вызовов, иначе таймер
+    # дороже самой операции. Если нужна подготовка (merge портит поле),
+    # каждый вызов меряется отдельно, а setup идёт вне замера. Первая
+    # пачка прогревает кэши и не учитывается.
+    if setup is not None:
+        inner = 1
+    for _ in range(inner):
+        if setup is not None:
+            setup()
+        op()
+    times = []
+    deadline = None if duration is None else time.perf_counter() + duration
+    for _ in range(samples):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(inner):
+            op()
+        times.append((time.perf_counter() - start) / inner)
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+    # Пропускная способность по медиане: вытеснение процесса планировщиком
+    # даёт редкие огромные замеры, которые уводят среднее.
+    ordered = sorted(times)
+    mean = sum(times) / len(times)
+    return {
+        'ops_per_sec': round(1 / ordered[len(ordered) // 2], 1),
+        'mean_us': round(mean * 1e6, 3),
+        'p95_us': round(ordered[int((len(ordered) - 1) * 0.95)] * 1e6, 3),
+        'samples': len(times)
+    }
+
+
+def engine_cases(board):
+    engine = make_engine(board)
+
+    def check_collision():
+        engine.check_collision(engine.current_piece, dy=1)
+
+    def rotate_piece():
+        # Четыре поворота T на спавне возвращают фигуру на место без сдвига.
+        engine.rotate_piece()
+
+    def prepare_merge():
+        load_board(engine, board)
+        engine.current_piece = lock_piece(engine, board)
+
+    yield 'check_collision', check_collision, None
+    yield 'calculate_shadow', engine.calculate_shadow, None
+    yield 'rotate_piece', rotate_piece, None
+    yield 'merge_piece+clear_lines', engine.merge_piece, prepare_merge
+
+
+def draw_cases(root, board, renderer_names):
+    # Полная отрисовка поля на пустом холсте: перед каждым замером тот же
+    # рендерер рисует пустое поле, затем замеряется переход к доске.
+    import tkinter as tk
+    from tetris import RENDERERS, TILE_SIZE
+
+    empty = make_engine('empty')
+    engine = make_engine(board)
+    cases = []
+    for name in renderer_names:
+        canvas = tk.Canvas(root, width=engine.width * TILE_SIZE, height=engine.height * TILE_SIZE)
+        canvas.pack(side=tk.LEFT)
+        renderer = RENDERERS[name](canvas, 0, 0, TILE_SIZE, engine.width, engine.height)
+
+        def clear(renderer=renderer, canvas=canvas):
+            renderer.render(empty, empty.calculate_shadow())
+            canvas.update_idletasks()
+
+        def draw_board(renderer=renderer, canvas=canvas):
+            renderer.render(engine, engine.calculate_shadow())
+            canvas.update_idletasks()
+
+        cases.append((f'draw_board[{name}]', draw_board, clear))
+    root.update()
+    return cases
+
+
+def run(boards, renderers, quick=False, only=None, repeat=3):
+    # Весь набор проходит repeat кругов подряд, для каждого замера остаётся
+    # лучший круг: медленные периоды машины не совпадают с одним замером.
+    root = None
+    if renderers:
+        import tkinter as tk
+        root = tk.Tk()
+    results = {}
+    samples = 50 if quick else 200
+    for _ in range(repeat):
+        for board in boards:
+            cases = [(name, op, setup, False) for name, op, setup in engine_cases(board)]
+            if root is not None:
+                cases += [(name, op, setup, True) for name, op, setup in draw_cases(root, board, renderers)]
+            for name, op, setup, draw in cases:
+                key = f"{name}/{board}"
+                if only and only not in key:
+                    continue
+                if draw:
+                    result = measure(op, setup, samples=samples // 2, duration=10.0)
+                    result['budget'] = round(result['p95_us'] / 1000 / FRAME_BUDGET_MS, 4)
+                else:
+                    result = measure(op, setup, samples=samples * (5 if setup else 1))
+                best = results.get(key)
+                if best is None or result['ops_per_sec'] > best['ops_per_sec']:
+                    results[key] = result
+            if root is not None:
+                for child in root.winfo_children():
+                    child.destroy()
+    if root is not None:
+        root.destroy()
+    for key, result in results.items():
+        print_result(key, result)
+    return results
+
+
+def print_result(key, result):
+    line = f"{key:<40}{result['ops_per_sec']:>14,.0f} op/s  p95 {result['p95_us']:>10.2f} µs"
+    if 'budget' in result:
+        line += f"  {result['budget'] * 100:5.1f}% кадра {FRAME_BUDGET_MS:.0f} мс"
+    print(line, flush=True)
+
+
+def compare(results, baseline, threshold):
+    # Регрессия: пропускная способность упала больше чем на threshold
+    # относительно сохранённого замера. p95 выводится для сведения: на
+    # общей машине он слишком шумный для порога.
+    regressions = []
+    for key, base in baseline.get('results', {}).items():
+        result = results.get(key)
+        if result is None:
+            continue
+        speed = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        tail = result['p95_us'] / base['p95_us'] - 1
+        flag = speed < -threshold
+        print(f"{key:<40}{speed * 100:+8.1f}% op/s  {tail * 100:+8.1f}% p95{'  РЕГРЕССИЯ' if flag else ''}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки движка и отрисовки Tetris")
+    parser.add_argument('--board', action='append', choices=BOARDS, help="по умолчанию все доски")
+    parser.add_argument('--renderer', action='append', help="по умолчанию canvas и raster")
+    parser.add_argument('--only', help="подстрока имени замера, например calculate_shadow")
+    parser.add_argument('--quick', action='store_true')
+    parser.add_argument('--repeat', type=int, default=3, help="кругов набора, берётся лучший")
+    parser.add_argument('--no-draw', action='store_true', help="без Tk, только движок")
+    parser.add_argument('--output', default=os.path.join(HERE, "results.json"))
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="записать результаты как базовые")
+    parser.add_argument('--threshold', type=float, default=0.25, help="допустимое ухудшение, доля")
+    args = parser.parse_args(argv)
+
+    renderers = [] if args.no_draw else (args.renderer or ['canvas', 'raster'])
+    server = None
+    if renderers and not os.environ.get('DISPLAY'):
+        from soak import start_xvfb
+        server = start_xvfb()
+        if server is None:
+            print("Нет дисплея и Xvfb: отрисовка пропущена")
+            renderers = []
+
+    try:
+        results = run(args.board or BOARDS, renderers, args.quick, args.only, args.repeat)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'frame_budget_ms': FRAME_BUDGET_MS,
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f"Результаты: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        print(f"Базовые значения обновлены: {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        print(f"Нет базовых значений {args.baseline}: запустите с --save-baseline")
+        return 0
+    print(f"Сравнение с {args.baseline} (python {baseline.get('python')}, {baseline.get('machine')}):")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"Регрессий: {len(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+
+MAGIC = b'TBND'
+VERSION = 1
+ALIGN = 16
+BUNDLE_PATH = "assets.bundle"
+ASSET_DIRS = ("images", "sounds")
+
+# Картинки в тех размерах, в которых их показывает игра: сначала меню,
+# затем игра и настройки. Третье поле — фильтр масштабирования.
+IMAGES = [
+    ("images/menu_background.jpg", (400, 750), None),
+    ("images/play_button.png", (300, 75), None),
+    ("images/options_button.png", (300, 75), None),
+    ("images/game_background.jpg", (400, 750), None),
+    ("images/gamepole.jpg", (314, 614), None),
+    ("images/exit.png", (100, 25), None),
+    ("images/optionsgame.png", (100, 28), None),
+    ("images/options_background.jpg", (400, 750), None),
+    ("images/music_button_on.jpg", (300, 75), 'lanczos'),
+    ("images/music_button_off.jpg", (300, 75), 'lanczos'),
+    ("images/volume_button_on.jpg", (300, 75), 'lanczos'),
+    ("images/volume_button_off.jpg", (300, 75), 'lanczos'),
+    ("images/replay_button.png", (300, 75), 'lanczos')
+]
+
+SOUNDS = [
+    "sounds/sound.wav",
+    "sounds/gameoversound.wav",
+    "sounds/menu_music.wav",
+    "sounds/music.wav"
+]
+
+
+def find_source(name):
+    # Ассеты могли лежать рядом с программой или в images/ и sounds/;
+    # возвращаем первый найденный путь или имя как есть.
+    base = os.path.basename(name)
+    for candidate in (name, base) + tuple(os.path.join(folder, base) for folder in ASSET_DIRS):
+        if os.path.exists(candidate):
+            return candidate
+    return name
+
+
+def image_key(name, size):
+    return f"{name}@{size[0]}x{size[1]}"
+
+
+class AssetBundle:
+    # Формат: MAGIC, версия и длина индекса (uint32), JSON-индекс, затем
+    # выровненные по ALIGN данные. Картинки — сырые RGBA уже нужного размера,
+    # звуки — PCM. Файл отображается в память и читается без копирования.
+    def __init__(self, path=BUNDLE_PATH):
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: это не пакет ассетов")
+        version, index_length = struct.unpack_from('<II', self.map, len(MAGIC))
+        if version != VERSION:
+            raise ValueError(f"Неподдерживаемая версия пакета: {version}")
+        header = len(MAGIC) + 8
+        index = json.loads(self.map[header:header + index_length])
+        self.entries = index['entries']
+        self.manifest = index['manifest']
+        self.data_start = align(header + index_length)
+        self.view = memoryview(self.map)
+
+    def resolve(self, name):
+        return self.manifest.get(name) or find_source(name)
+
+    def data(self, entry):
+        start = self.data_start + entry['offset']
+        return self.view[start:start + entry['length']]
+
+    def image(self, name, size):
+        entry = self.entries.get(image_key(name, size))
+        if entry is None:
+            return None
+        return (entry['width'], entry['height']), self.data(entry)
+
+    def sound(self, name):
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        return self.data(entry), entry['channels'], entry['sample_size'], entry['sample_rate']
+
+
+def align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def load_bundle(path=BUNDLE_PATH):
+    try:
+        return AssetBundle(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ошибка чтения пакета ассетов: {e}")
+        return None
+
+
+def build(output=BUNDLE_PATH, images=IMAGES, sounds=SOUNDS):
+    from PIL import Image
+    from audio import load_wave
+
+    entries = {}
+    manifest = {}
+    blobs = []
+    offset = 0
+
+    def add(key, data, **meta):
+        nonlocal offset
+        entries[key] = dict(meta, offset=offset, length=len(data))
+        padding = align(len(data)) - len(data)
+        blobs.append(data)
+        blobs.append(bytes(padding))
+        offset += len(data) + padding
+
+    for name, size, resample in images:
+        source = find_source(name)
+        try:
+            image = Image.open(source).convert('RGBA')
+        except OSError as e:
+            print(f"Картинка {name} не упакована: {e}")
+            continue
+        resample = getattr(Image.Resampling, resample.upper()) if resample else None
+        image = image.resize(size, resample)
+        manifest[name] = source
+        add(image_key(name, size), image.tobytes(), kind='image', width=size[0], height=size[1])
+
+    for name in sounds:
+        source = find_source(name)
+        try:
+            wave_data = load_wave(source)
+        except Exception as e:
+            print(f"Звук {name} не упакован: {e}")
+            continue
+        manifest[name] = source
+        add(name, bytes(wave_data.data), kind='sound', channels=wave_data.channels,
+            sample_size=wave_data.sample_size, sample_rate=wave_data.sample_rate)
+
+    index = json.dumps({'entries': entries, 'manifest': manifest}).encode('utf-8')
+    header = MAGIC + struct.pack('<II', VERSION, len(index)) + index
+    temp_path = output + ".tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(header)
+        file.write(bytes(align(len(header)) - len(header)))
+        for blob in blobs:
+            file.write(blob)
+    os.replace(temp_path, output)
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сборка пакета ассетов Tetris")
+    parser.add_argument('--output', default=BUNDLE_PATH)
+    args = parser.parse_args(argv)
+
+    entries = build(args.output)
+    size = os.path.getsize(args.output)
+    print(f"{args.output}: {len(entries)} ассетов, {size / 1024:.0f} КБ")
+
+
+if __name__ == "__main__":
+    main()
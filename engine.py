@@ -0,0 +1,528 @@
+import random
+from collections import deque, namedtuple
+
+WIDTH = 10
+HEIGHT = 20
+FPS = 3
+TICK_RATE = 60
+GRAVITY_TICKS = TICK_RATE // FPS
+FAST_FALL_TICKS = 3
+DAS_TICKS = 10
+ARR_TICKS = 2
+PREVIEW = 2
+# Окно строки в collides: фигура не шире четырёх клеток.
+WINDOW_MASK = 0xF
+
+KEY_ACTIONS = {
+    'Left': 'left',
+    'Right': 'right',
+    'Down': 'down',
+    'Up': 'rotate',
+    'space': 'drop'
+}
+KEYS = tuple(KEY_ACTIONS)
+REPEAT_KEYS = ('Left', 'Right')
+RESET_INPUT = 2 * len(KEYS)
+
+COLORS = ['cyan', 'blue', 'orange', 'yellow', 'green', 'purple', 'red']
+
+SHAPES = [
+    [[1, 1, 1, 1]],
+    [[1, 1, 1], [0, 1, 0]],
+    [[1, 1], [1, 1]],
+    [[1, 1, 0], [0, 1, 1]],
+    [[0, 1, 1], [1, 1, 0]],
+    [[1, 1, 1], [1, 0, 0]],
+    [[1, 1, 1], [0, 0, 1]]
+]
+
+
+KICKS = ((0, 0), (-1, 0), (1, 0), (0, -1))
+LONG_KICKS = KICKS + ((-2, 0), (2, 0))
+
+RotationState = namedtuple('RotationState', 'shape cells masks width height kicks bottoms')
+
+
+def row_bits(row):
+    bits = 0
+    for x, cell in enumerate(row):
+        if cell:
+            bits |= 1 << x
+    return bits
+
+
+def build_rotations(shape):
+    states = []
+    seen = set()
+    for _ in range(4):
+        key = tuple(tuple(row) for row in shape)
+        if key in seen:
+            break
+        seen.add(key)
+        width = len(shape[0])
+        states.append(RotationState(
+            shape=key,
+            cells=tuple((x, y) for y, row in enumerate(shape) for x, cell in enumerate(row) if cell),
+            masks=tuple(row_bits(row) for row in shape),
+            width=width,
+            height=len(shape),
+            kicks=LONG_KICKS if max(width, len(shape)) > 3 else KICKS,
+            bottoms=tuple(
+                max(y for y, row in enumerate(shape) if row[x])
+                for x in range(width)
+            )
+        ))
+        shape = [list(row) for row in zip(*shape[::-1])]
+    return tuple(states)
+
+
+ROTATIONS = tuple(build_rotations(shape) for shape in SHAPES)
+
+
+class Piece:
+    # Вид и поворот — индексы в ROTATIONS, цвет — индекс в том виде, в каком
+    # он лежит в Engine.colors (1..len(COLORS)). Без словаря экземпляр
+    # можно переписывать на месте, ничего не выделяя.
+    __slots__ = ('kind', 'rotation', 'color', 'x', 'y')
+
+    def __init__(self, kind=0, rotation=0, color=1, x=0, y=0):
+        self.kind = kind
+        self.rotation = rotation
+        self.color = color
+        self.x = x
+        self.y = y
+
+    def assign(self, other):
+        self.kind = other.kind
+        self.rotation = other.rotation
+        self.color = other.color
+        self.x = other.x
+        self.y = other.y
+        return self
+
+    def same(self, other):
+        return (self.x == other.x and self.y == other.y and self.rotation == other.rotation
+                and self.kind == other.kind and self.color == other.color)
+
+
+def piece_state(piece):
+    return ROTATIONS[piece.kind][piece.rotation]
+
+
+PIECE_MOVED = 'piece_moved'
+PIECE_LOCKED = 'piece_locked'
+ROWS_CLEARED = 'rows_cleared'
+SCORE_CHANGED = 'score_changed'
+GAME_OVER = 'game_over'
+
+
+class EventBus:
+    # События движка: piece_moved(piece), piece_locked(piece, rows),
+    # rows_cleared(rows), score_changed(score, lines), game_over().
+    # Без подписчиков emit ничего не делает, так что self-play не платит.
+    def __init__(self):
+        self.handlers = {}
+
+    def subscribe(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def unsubscribe(self, event, handler):
+        handlers = self.handlers.get(event)
+        if handlers and handler in handlers:
+            handlers.remove(handler)
+
+    def emit(self, event, *args):
+        # Обход по индексу: итератор списка — это объект в куче, а emit
+        # вызывается из цикла кадра.
+        handlers = self.handlers.get(event)
+        if handlers:
+            i = 0
+            while i < len(handlers):
+                handlers[i](*args)
+                i += 1
+
+    def emit_one(self, event, arg):
+        # emit для одного аргумента: без *args не собирается кортеж, и сдвиг
+        # фигуры ничего не выделяет, даже когда кортежи из списка свободных
+        # разобраны кодом между кадрами.
+        handlers = self.handlers.get(event)
+        if handlers:
+            i = 0
+            while i < len(handlers):
+                handlers[i](arg)
+                i += 1
+
+
+class Engine:
+    # Каждая строка поля хранится как битовая маска: бит x установлен,
+    # если клетка (x, y) занята. Цвета лежат отдельно в плоском bytearray.
+    def __init__(self, width=WIDTH, height=HEIGHT, rng=None, preview=PREVIEW):
+        self.width = width
+        self.height = height
+        self.preview = deque(maxlen=preview)
+        self.full_row = (1 << width) - 1
+        self.rng = rng if rng is not None else random.Random()
+        self.events = EventBus()
+        self.shadow = Piece()
+        self.reset()
+
+    def reset(self):
+        self.rows = [0] * self.height
+        # windows[y][x] — биты строки y, начиная со столбца x, в ширину
+        # фигуры. Столкновение проверяется по ним малыми int, которые не
+        # создаются заново; сдвиг маски строки на лету давал бы новый int,
+        # как только результат больше 256.
+        self.windows = [bytearray(self.width) for _ in range(self.height)]
+        self.colors = bytearray(self.width * self.height)
+        self.heights = [0] * self.width
+        self.score = 0
+        self.lines = 0
+        self.pieces = 0
+        self.game_over = False
+        # Очередь следующих фигур заполняется тем же генератором и в том же
+        # порядке, так что последовательность фигур от seed не меняется.
+        self.preview.clear()
+        while len(self.preview) < self.preview.maxlen:
+            self.preview.append(self.new_piece())
+        self.current_piece = self.next_piece()
+
+    def new_piece(self):
+        kind = self.rng.randrange(len(SHAPES))
+        # randrange(n) тратит генератор так же, как choice по списку из n,
+        # поэтому старые записи партий воспроизводятся без изменений.
+        color = self.rng.randrange(len(COLORS)) + 1
+        return Piece(kind, 0, color, self.width // 2 - ROTATIONS[kind][0].width // 2, -1)
+
+    def next_piece(self):
+        if not self.preview.maxlen:
+            return self.new_piece()
+        piece = self.preview.popleft()
+        self.preview.append(self.new_piece())
+        return piece
+
+    def check_collision(self, piece, dx=0, dy=0):
+        return self.collides(ROTATIONS[piece.kind][piece.rotation], piece.x + dx, piece.y + dy)
+
+    def collides(self, state, x, y):
+        if x < 0 or x + state.width > self.width or y + state.height > self.height:
+            return True
+        # Горячие циклы (collides, drop_y) идут по индексу, без
+        # итераторов, чтобы тик с гравитацией ничего не выделял в куче.
+        windows = self.windows
+        masks = state.masks
+        r = 0
+        while r < state.height:
+            if y >= 0 and windows[y][x] & masks[r]:
+                return True
+            y += 1
+            r += 1
+        return False
+
+    def move(self, dx, dy):
+        if self.game_over or self.check_collision(self.current_piece, dx=dx, dy=dy):
+            return False
+        piece = self.current_piece
+        piece.x += dx
+        piece.y += dy
+        self.events.emit_one(PIECE_MOVED, piece)
+        return True
+
+    def rotate_piece(self):
+        piece = self.current_piece
+        states = ROTATIONS[piece.kind]
+        rotation = (piece.rotation + 1) % len(states)
+        if rotation == piece.rotation:
+            return False
+        state = states[rotation]
+        kicks = state.kicks
+        i = 0
+        while i < len(kicks):
+            dx, dy = kicks[i]
+            if not self.collides(state, piece.x + dx, piece.y + dy):
+                piece.rotation = rotation
+                piece.x += dx
+                piece.y += dy
+                self.events.emit_one(PIECE_MOVED, piece)
+                return True
+            i += 1
+        return False
+
+    def drop_y(self, state, x, y):
+        # Высоты столбцов дают точку приземления, если фигура целиком
+        # выше поверхности. Если она задвинута под навес, ищем перебором.
+        landing = self.height
+        heights = self.heights
+        top = self.height - 1
+        bottoms = state.bottoms
+        c = 0
+        while c < state.width:
+            row = top - heights[x + c] - bottoms[c]
+            if row < landing:
+                landing = row
+            c += 1
+        if landing >= y:
+            return landing
+        while not self.collides(state, x, y + 1):
+            y += 1
+        return y
+
+    def drop_distance(self):
+        piece = self.current_piece
+        return self.drop_y(ROTATIONS[piece.kind][piece.rotation], piece.x, piece.y) - piece.y
+
+    def calculate_shadow(self):
+        # Тень у движка одна и переписывается на месте при каждом вызове.
+        shadow = self.shadow.assign(self.current_piece)
+        shadow.y += self.drop_distance()
+        return shadow
+
+    def place(self, rotation, x):
+        piece = self.current_piece
+        state = ROTATIONS[piece.kind][rotation]
+        if self.game_over or self.collides(state, x, piece.y):
+            return None
+        piece.rotation = rotation
+        piece.x = x
+        return self.hard_drop()
+
+    def hard_drop(self):
+        if self.game_over:
+            return None
+        self.current_piece.y += self.drop_distance()
+        return self.merge_piece()
+
+    def merge_piece(self):
+        piece = self.current_piece
+        color = piece.color
+        heights = self.heights
+        rows = []
+        for r, mask in enumerate(piece_state(piece).masks):
+            y = piece.y + r
+            if not 0 <= y < self.height:
+                continue
+            rows.append(y)
+            bits = mask << piece.x
+            self.rows[y] |= bits
+            surface = self.height - y
+            base = y * self.width
+            x = 0
+            while bits:
+                if bits & 1:
+                    self.colors[base + x] = color
+                    if heights[x] < surface:
+                        heights[x] = surface
+                bits >>= 1
+                x += 1
+            self.update_window(y)
+        self.pieces += 1
+        self.events.emit(PIECE_LOCKED, piece, rows)
+
+        cleared = self.clear_lines()
+        self.current_piece = self.next_piece()
+        if self.check_collision(self.current_piece):
+            self.game_over = True
+            self.events.emit(GAME_OVER)
+        else:
+            self.events.emit_one(PIECE_MOVED, self.current_piece)
+        return cleared
+
+    def clear_lines(self):
+        # Один проход снизу вверх: непустые строки сдвигаются на место
+        # убранных прямо в rows и colors, сверху остаются пустые строки.
+        full = self.full_row
+        rows = self.rows
+        if full not in rows:
+            return 0
+        colors = self.colors
+        windows = self.windows
+        width = self.width
+        cleared = []
+        write = self.height - 1
+        for y in range(self.height - 1, -1, -1):
+            if rows[y] == full:
+                cleared.append(y)
+                continue
+            if write != y:
+                rows[write] = rows[y]
+                windows[write][:] = windows[y]
+                colors[write * width:(write + 1) * width] = colors[y * width:(y + 1) * width]
+            write -= 1
+        for y in range(write + 1):
+            rows[y] = 0
+            windows[y][:] = bytes(width)
+        colors[:(write + 1) * width] = bytes((write + 1) * width)
+
+        count = len(cleared)
+        self.update_heights(count)
+        self.lines += count
+        self.score += count * 100
+        cleared.reverse()
+        self.events.emit(ROWS_CLEARED, cleared)
+        self.events.emit(SCORE_CHANGED, self.score, self.lines)
+        return count
+
+    def update_window(self, y):
+        row = self.rows[y]
+        window = self.windows[y]
+        for x in range(self.width):
+            window[x] = row >> x & WINDOW_MASK
+
+    def update_heights(self, cleared):
+        # Заполненная строка занимает все столбцы, поэтому вершина каждого
+        # столбца не ниже убранных строк. Сверху вниз пересчитываются только
+        # столбцы, чья вершина сама оказалась в убранной строке.
+        rows = self.rows
+        for x in range(self.width):
+            height = self.heights[x] - cleared
+            if height > 0:
+                bit = 1 << x
+                y = self.height - height
+                while y < self.height and not rows[y] & bit:
+                    y += 1
+                height = self.height - y
+            self.heights[x] = height
+
+class Game:
+    # Покадровая логика поверх Engine: удержание клавиш, DAS/ARR и гравитация
+    # в тиках. Все входные события можно записать как (тик, код) и затем
+    # воспроизвести побайтно без окна.
+    def __init__(self, seed=None, width=WIDTH, height=HEIGHT, recorder=None):
+        self.engine = Engine(width, height)
+        self.keys_pressed = set()
+        self.keys_released = set()
+        self.held_ticks = {}
+        self.actions = []
+        self.traced = []
+        self.restart(seed, recorder)
+
+    def restart(self, seed=None, recorder=None):
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.recorder = recorder
+        if recorder is not None:
+            recorder.start(self.seed, self.engine.width, self.engine.height)
+        self.engine.rng = random.Random(self.seed)
+        self.engine.reset()
+        self.ticks = 0
+        self.gravity_ticks = 0
+        self.fast_fall = False
+        self.dirty = True
+        self.clear_input()
+
+    def input(self, code, stamp=None):
+        if self.recorder is not None:
+            self.recorder.record(self.ticks, code)
+        if code == RESET_INPUT:
+            self.clear_input()
+        elif code % 2:
+            self.release(KEYS[code // 2])
+        else:
+            self.press(KEYS[code // 2], stamp)
+
+    def key_press(self, key, stamp=None):
+        if key in KEY_ACTIONS and not self.engine.game_over:
+            self.input(KEYS.index(key) * 2, stamp)
+
+    def key_release(self, key):
+        if key in self.keys_pressed:
+            self.input(KEYS.index(key) * 2 + 1)
+
+    def reset_input(self):
+        self.input(RESET_INPUT)
+
+    def press(self, key, stamp=None):
+        # Автоповтор X11 присылает пары KeyRelease/KeyPress: такое отпускание
+        # отменяется, а повторы нажатия игнорируются, ими управляет DAS/ARR.
+        if key in self.keys_released:
+            self.keys_released.discard(key)
+            return
+        if key in self.keys_pressed:
+            return
+        self.keys_pressed.add(key)
+        self.held_ticks[key] = 0
+        self.actions.append((KEY_ACTIONS[key], stamp))
+
+    def release(self, key):
+        if key in self.keys_pressed:
+            self.keys_released.add(key)
+
+    def clear_input(self):
+        self.keys_pressed.clear()
+        self.keys_released.clear()
+        self.held_ticks.clear()
+        self.actions.clear()
+        self.traced.clear()
+        self.fast_fall = False
+
+    def process_input(self):
+        # Очереди ввода разбираются по индексу или через pop, без итераторов:
+        # тик с нажатием выделяет не больше тика без него.
+        while self.keys_released:
+            self.keys_pressed.discard(self.keys_released.pop())
+        self.fast_fall = 'Down' in self.keys_pressed
+
+        # Время нажатия идёт вместе с действием; если оно изменило поле,
+        # пара попадает в traced, пока интерфейс не отметит отрисовку.
+        if self.actions:
+            actions = self.actions
+            i = 0
+            while i < len(actions):
+                action, stamp = actions[i]
+                if self.apply_action(action) and stamp is not None:
+                    self.traced.append((action, stamp))
+                i += 1
+            actions.clear()
+
+        if not self.keys_pressed:
+            return
+        i = 0
+        while i < len(REPEAT_KEYS):
+            key = REPEAT_KEYS[i]
+            if key in self.keys_pressed:
+                held = self.held_ticks[key] + 1
+                if held >= DAS_TICKS and (held - DAS_TICKS) % ARR_TICKS == 0:
+                    self.apply_action(KEY_ACTIONS[key])
+                    # Дальше важен только остаток по ARR_TICKS: счётчик
+                    # не растёт и остаётся малым int, который не создаётся.
+                    held = DAS_TICKS
+                self.held_ticks[key] = held
+            i += 1
+
+    def apply_action(self, action):
+        engine = self.engine
+        if engine.game_over:
+            return False
+        if action == 'left':
+            moved = engine.move(-1, 0)
+        elif action == 'right':
+            moved = engine.move(1, 0)
+        elif action == 'down':
+            moved = engine.move(0, 1)
+        elif action == 'rotate':
+            moved = engine.rotate_piece()
+        elif action == 'drop':
+            engine.hard_drop()
+            moved = True
+        if moved:
+            self.dirty = True
+        return moved
+
+    def tick(self):
+        engine = self.engine
+        if engine.game_over:
+            return
+        # Тик считается до ввода: если сброс фигуры закончит партию, GAME_OVER
+        # увидит номер уже начатого тика, и повтор, идущий до end_tick,
+        # проиграет этот тик вместе с его вводом.
+        self.ticks += 1
+        self.process_input()
+        if engine.game_over:
+            return
+
+        self.gravity_ticks += 1
+        if self.gravity_ticks < (FAST_FALL_TICKS if self.fast_fall else GRAVITY_TICKS):
+            return
+        self.gravity_ticks = 0
+
+        if not engine.move(0, 1):
+            engine.merge_piece()
+        self.dirty = True
@@ -0,0 +1,212 @@
+import random
+from collections import OrderedDict
+
+from engine import ROTATIONS, SHAPES
+from placement import board_array, candidates, landing_rows
+from simulate import board_features
+
+ZOBRIST_SEED = 0x7E7215
+
+
+class TranspositionTable:
+    # Ограниченный LRU-кэш по 64-битному ключу. Строки поля хранятся рядом
+    # со значением, поэтому редкая коллизия хэшей даёт промах, а не
+    # чужой результат.
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, rows):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != rows:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, rows, value):
+        self.entries[key] = (rows, value)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+class Lookahead:
+    # Перебор на несколько фигур вперёд: текущая плюс очередь preview.
+    # Раскрытие пары (поле, фигура) — все повороты и столбцы с оценкой
+    # Dellacherie — кэшируется по хэшу Зобриста. Следующий ход раскрывает
+    # те же поля с теми же фигурами, поэтому кэш работает и между ходами.
+    # Вглубь идут только beam лучших по статической оценке вариантов.
+    def __init__(self, width, height, depth=3, beam=6, max_entries=20000):
+        self.width = width
+        self.height = height
+        self.full_row = (1 << width) - 1
+        self.depth = depth
+        self.beam = beam
+        self.table = TranspositionTable(max_entries)
+        rng = random.Random(ZOBRIST_SEED)
+        self.cell_keys = [rng.getrandbits(64) for _ in range(width * height)]
+        self.piece_keys = [rng.getrandbits(64) for _ in SHAPES]
+
+    def board_hash(self, rows):
+        keys = self.cell_keys
+        width = self.width
+        value = 0
+        for y, bits in enumerate(rows):
+            base = y * width
+            while bits:
+                low = bits & -bits
+                value ^= keys[base + low.bit_length() - 1]
+                bits ^= low
+        return value
+
+    def expand(self, rows, board_hash, kind):
+        key = board_hash ^ self.piece_keys[kind]
+        children = self.table.get(key, rows)
+        if children is None:
+            children = self.placements(rows, board_hash, kind)
+            self.table.put(key, rows, children)
+        return children
+
+    def lock(self, rows, board_hash, state, x, y):
+        placed = list(rows)
+        for r, mask in enumerate(state.masks):
+            placed[y + r] |= mask << x
+        full = self.full_row
+        cleared = [r for r in range(state.height) if placed[y + r] == full]
+        if not cleared:
+            keys = self.cell_keys
+            width = self.width
+            for cx, cy in state.cells:
+                board_hash ^= keys[(y + cy) * width + x + cx]
+            return tuple(placed), board_hash, 0
+        eroded = len(cleared) * sum(state.masks[r].bit_count() for r in cleared)
+        kept = [row for row in placed if row != full]
+        placed = tuple([0] * (self.height - len(kept)) + kept)
+        return placed, self.board_hash(placed), eroded
+
+    def placements(self, rows, board_hash, kind):
+        # Фигура появляется на строке -1, как в Engine.new_piece, и падает
+        # прямо вниз. Точки приземления всех поворотов и столбцов считает
+        # разом placement.landing_rows. В кэш идут только оценки и ходы, а
+        # не сами поля: поле потомка дешевле пересчитать при спуске, чем
+        # держать в памяти.
+        width = self.width
+        height = self.height
+        table = candidates(kind, width)
+        landing, valid = landing_rows(board_array(rows, width), table, -1)
+        states = ROTATIONS[kind]
+        children = []
+        for rotation, x, y, fits in zip(table['rotation'].tolist(), table['x'].tolist(),
+                                        landing.tolist(), valid.tolist()):
+            if not fits or y < 0:
+                continue
+            state = states[rotation]
+            placed, child_hash, eroded = self.lock(rows, board_hash, state, x, y)
+            landing_height = height - y - (state.height - 1) / 2
+            row_transitions, column_transitions, holes, wells = board_features(placed, width)
+            step = eroded - landing_height
+            static = -row_transitions - column_transitions - 4 * holes - wells
+            children.append((step + static, step, rotation, x, y))
+        children.sort(key=lambda child: child[0], reverse=True)
+        return children
+
+    def value(self, rows, board_hash, kinds):
+        children = self.expand(rows, board_hash, kinds[0])
+        if not children:
+            return float('-inf')
+        if len(kinds) == 1:
+            return children[0][0]
+        states = ROTATIONS[kinds[0]]
+        best = float('-inf')
+        for score, step, rotation, x, y in children[:self.beam]:
+            placed, child_hash, _ = self.lock(rows, board_hash, states[rotation], x, y)
+            best = max(best, step + self.value(placed, child_hash, kinds[1:]))
+        return best
+
+    def best_move(self, engine, piece=None):
+        piece = piece or engine.current_piece
+        kinds = [piece.kind] + [queued.kind for queued in engine.preview][:self.depth - 1]
+        rows = tuple(engine.rows)
+        board_hash = self.board_hash(rows)
+        children = self.expand(rows, board_hash, kinds[0])
+        states = ROTATIONS[kinds[0]]
+        best = None
+        best_value = float('-inf')
+        for score, step, rotation, x, y in children[:self.beam if len(kinds) > 1 else 1]:
+            if len(kinds) == 1:
+                value = score
+            else:
+                placed, child_hash, _ = self.lock(rows, board_hash, states[rotation], x, y)
+                value = step + self.value(placed, child_hash, kinds[1:])
+            if best is None or value > best_value:
+                best = (rotation, x)
+                best_value = value
+        return best
+
+
+searchers = {}
+
+
+def get_searcher(width, height, depth=3, beam=6):
+    # Один поиск на процесс и размер поля, чтобы кэш переживал ходы и партии.
+    key = (width, height, depth, beam)
+    searcher = searchers.get(key)
+    if searcher is None:
+        searcher = searchers[key] = Lookahead(width, height, depth, beam)
+    return searcher
+
+
+def policy(engine, rng):
+    return get_searcher(engine.width, engine.height).best_move(engine)
+
+
+class Autopilot:
+    # Автоигра для окна: ход выбирается один раз на фигуру, затем каждый
+    # тик отдаёт одну клавишу, которая приближает фигуру к цели. Клавиши
+    # идут через обычный ввод Game и попадают в запись повтора.
+    MAX_KEYS = 24
+
+    def __init__(self, searcher):
+        self.searcher = searcher
+        self.piece = None
+        self.target = None
+        self.keys = 0
+
+    def next_key(self, engine):
+        piece = engine.current_piece
+        if piece is not self.piece:
+            self.piece = piece
+            self.target = self.searcher.best_move(engine)
+            self.keys = 0
+        if self.target is None or engine.game_over:
+            return None
+        self.keys += 1
+        rotation, x = self.target
+        if self.keys >= self.MAX_KEYS:
+            return 'space'
+        if piece.rotation != rotation:
+            return 'Up'
+        if piece.x < x:
+            return 'Right'
+        if piece.x > x:
+            return 'Left'
+        return 'space'
@@ -0,0 +1,121 @@
+import numpy as np
+
+from engine import ROTATIONS
+
+WEIGHTS = {
+    'aggregate_height': -0.510066,
+    'lines': 0.760666,
+    'holes': -0.35663,
+    'bumpiness': -0.184483
+}
+
+candidate_tables = {}
+
+
+def candidates(kind, width):
+    # Для каждой пары (поворот, столбец) заранее готовим координаты клеток,
+    # чтобы оценка не содержала циклов Python.
+    key = (kind, width)
+    table = candidate_tables.get(key)
+    if table is not None:
+        return table
+
+    rotations, columns, cell_x, cell_y = [], [], [], []
+    for rotation, state in enumerate(ROTATIONS[kind]):
+        for x in range(width - state.width + 1):
+            rotations.append(rotation)
+            columns.append(x)
+            cell_x.append([x + cx for cx, cy in state.cells])
+            cell_y.append([cy for cx, cy in state.cells])
+
+    table = {
+        'rotation': np.array(rotations),
+        'x': np.array(columns),
+        'cell_x': np.array(cell_x),
+        'cell_y': np.array(cell_y)
+    }
+    candidate_tables[key] = table
+    return table
+
+
+def board_array(rows, width):
+    # Строки — int любой ширины: раскладываем их по байтам и на биты, без
+    # приведения к int64, которое переполнилось бы на поле шире 63 клеток.
+    size = (width + 7) // 8
+    data = b"".join(row.to_bytes(size, 'little') for row in rows)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little')
+    return bits.reshape(len(rows), size * 8)[:, :width].astype(bool)
+
+
+def landing_rows(board, table, spawn):
+    # Проверяем все высоты от появления фигуры до дна разом: над полем
+    # клетки пустые, под полем заняты. Первая занятая высота минус один и
+    # есть точка приземления. valid ложно, если фигура не помещается уже
+    # в точке появления.
+    height, width = board.shape
+    above = max(0, -spawn)
+    padded = np.vstack([
+        np.zeros((above, width), dtype=bool),
+        board,
+        np.ones((4, width), dtype=bool)
+    ])
+    drops = np.arange(spawn, height + 1)
+    cell_y = drops[None, None, :] + table['cell_y'][:, :, None] + above
+    hits = padded[cell_y, table['cell_x'][:, :, None]].any(axis=1)
+    return drops[hits.argmax(axis=1)] - 1, ~hits[:, 0]
+
+
+def evaluate_placements(engine, piece=None):
+    piece = piece or engine.current_piece
+    height, width = engine.height, engine.width
+    table = candidates(piece.kind, width)
+    count = len(table['rotation'])
+    rows = np.arange(height)
+
+    board = board_array(engine.rows, width)
+    landing, valid = landing_rows(board, table, piece.y)
+
+    boards = np.repeat(board[None], count, axis=0)
+    cell_y = landing[:, None] + table['cell_y']
+    inside = cell_y >= 0
+    candidate_index = np.repeat(np.arange(count), table['cell_x'].shape[1]).reshape(cell_y.shape)
+    boards[candidate_index[inside], cell_y[inside], table['cell_x'][inside]] = True
+
+    full = boards.all(axis=2)
+    lines = full.sum(axis=1)
+    order = np.argsort(~full, axis=1, kind='stable')
+    boards = np.take_along_axis(boards, order[:, :, None], axis=1)
+    boards[rows[None, :] < lines[:, None]] = False
+
+    column_filled = boards.any(axis=1)
+    heights = np.where(column_filled, height - boards.argmax(axis=1), 0)
+    holes = (np.logical_or.accumulate(boards, axis=1) & ~boards).sum(axis=(1, 2))
+
+    return {
+        'rotation': table['rotation'],
+        'x': table['x'],
+        'landing_row': landing,
+        'valid': valid,
+        'lines': lines,
+        'holes': holes,
+        'bumpiness': np.abs(np.diff(heights, axis=1)).sum(axis=1),
+        'aggregate_height': heights.sum(axis=1)
+    }
+
+
+def score_placements(result, weights=WEIGHTS):
+    score = sum(weight * result[name] for name, weight in weights.items())
+    return np.where(result['valid'], score, -np.inf)
+
+
+def best_placement(engine, weights=WEIGHTS):
+    result = evaluate_placements(engine)
+    score = score_placements(result, weights)
+    best = int(score.argmax())
+    if not np.isfinite(score[best]):
+        return None
+    return int(result['rotation'][best]), int(result['x'][best])
+
+
+def policy(engine, rng):
+    return best_placement(engine)
@@ -0,0 +1,334 @@
+import cProfile
+import csv
+import json
+import os
+import time
+from array import array
+from collections import deque
+
+
+class RingBuffer:
+    def __init__(self, size):
+        self.values = array('d', bytes(8 * size))
+        self.size = size
+        self.index = 0
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def last(self):
+        return self.values[self.index - 1] if self.count else 0.0
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        ordered = sorted(self.values[:self.count])
+        last = self.count - 1
+        return {
+            'count': self.count,
+            'mean': sum(ordered) / self.count,
+            'p50': ordered[int(last * 0.50)],
+            'p95': ordered[int(last * 0.95)],
+            'p99': ordered[int(last * 0.99)],
+            'max': self.max
+        }
+
+
+class FrameProfiler:
+    # Времена этапов в миллисекундах хранятся в кольцевых буферах, чтобы
+    # перцентили отражали последние кадры, а память не росла.
+    def __init__(self, size=600):
+        self.size = size
+        self.stages = {}
+        self.profile = None
+
+    def record(self, stage, seconds):
+        buffer = self.stages.get(stage)
+        if buffer is None:
+            buffer = self.stages[stage] = RingBuffer(self.size)
+        buffer.add(seconds * 1000)
+
+    def wrap(self, stage, function):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def last(self, stage):
+        buffer = self.stages.get(stage)
+        return buffer.last() if buffer else 0.0
+
+    def summary(self, stage=None):
+        if stage is not None:
+            buffer = self.stages.get(stage)
+            return buffer.summary() if buffer else {'count': 0}
+        return {name: buffer.summary() for name, buffer in self.stages.items()}
+
+    def dump(self, directory="profiles"):
+        os.makedirs(directory, exist_ok=True)
+        file_path = os.path.join(directory, time.strftime("frame-%Y%m%d-%H%M%S.json"))
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(self.summary(), file, indent=2)
+        return file_path
+
+    def toggle_cprofile(self, directory="profiles"):
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            return None
+        self.profile.disable()
+        os.makedirs(directory, exist_ok=True)
+        file_path = os.path.join(directory, time.strftime("cprofile-%Y%m%d-%H%M%S.prof"))
+        self.profile.dump_stats(file_path)
+        self.profile = None
+        return file_path
+
+
+class LatencyTracer:
+    # Задержка от KeyPress до сброса холста (после update_idletasks) для
+    # каждого действия за сессию.
+    def __init__(self, max_samples=100000):
+        self.samples = deque(maxlen=max_samples)
+        self.session_start = time.time()
+
+    def record(self, action, stamp, flushed):
+        self.samples.append((action, stamp, (flushed - stamp) * 1000))
+
+    def summary(self):
+        actions = {}
+        for action, stamp, latency in self.samples:
+            buffer = actions.get(action)
+            if buffer is None:
+                buffer = actions[action] = RingBuffer(len(self.samples))
+            buffer.add(latency)
+        return {action: buffer.summary() for action, buffer in actions.items()}
+
+    def export(self, directory="profiles", keep=None):
+        # keep ограничивает число сохранённых сессий: старые пары файлов
+        # удаляются, имена с датой сортируются по времени.
+        if not self.samples:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, time.strftime("latency-%Y%m%d-%H%M%S", time.localtime(self.session_start)))
+        with open(base + ".csv", 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['action', 'pressed', 'latency_ms'])
+            writer.writerows(self.samples)
+        with open(base + ".json", 'w', encoding='utf-8') as file:
+            json.dump({'session_start': self.session_start, 'actions': self.summary()}, file, indent=2)
+        if keep is not None:
+            sessions = sorted(name[:-5] for name in os.listdir(directory)
+                              if name.startswith("latency-") and name.endswith(".json"))
+            for name in sessions[:-keep]:
+                for extension in (".csv", ".json"):
+                    try:
+                        os.remove(os.path.join(directory, name + extension))
+                    except FileNotFoundError:
+                        pass
+        return base
+
+
+class StartupTimer:
+    # Этапы холодного старта: основной поток отмечает их по порядку, фоновые
+    # задачи добавляют свою длительность отдельно.
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.last = self.start
+        self.stages = []
+        self.background = {}
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, (now - self.last) * 1000))
+        self.last = now
+
+    def record(self, stage, seconds):
+        self.background[stage] = seconds * 1000
+
+    def report(self):
+        lines = ["Запуск:"]
+        lines += [f"  {stage:<12}{ms:8.1f} ms" for stage, ms in self.stages]
+        lines.append(f"  {'total':<12}{(self.last - self.start) * 1000:8.1f} ms")
+        lines += [f"  {stage:<12}{ms:8.1f} ms (фон)" for stage, ms in self.background.items()]
+        return "\n".join(lines)
+
+
+# Допуски на выделения за кадр, в байтах. Кадр без фиксации фигуры
+# создаёт только новый int счётчика Game.ticks: после 256 он уже не
+# берётся из кэша малых int, а старый объект тут же освобождается.
+# Фиксация законно создаёт следующую фигуру очереди, кортежи аргументов
+# событий и списки убранных строк. Отрисовка не проверяется: каждый вызов
+# Tk собирает кортеж аргументов, её пик только выводится.
+FRAME_TOLERANCE = 32
+LOCK_TOLERANCE = 1024
+
+
+def frame_peaks(steps, frames, between, warmup=0):
+    # Пик выделений каждого шага кадра сверх памяти перед ним: выделение с
+    # освобождением в том же кадре прирост не меняет, а пик показывает.
+    # between(peaks) вызывается после кадра вне замера, peaks[i] — пик
+    # steps[i]; там готовится ввод и ведётся учёт. В warmup первых кадрах,
+    # пока интерпретатор специализирует байткод, peaks равен None. Само
+    # чтение счётчиков tracemalloc создаёт int, поэтому ноль шкалы — пик
+    # пустого шага, измеренного тем же кодом.
+    import itertools
+    import tracemalloc
+    traced = tracemalloc.get_traced_memory
+    reset = tracemalloc.reset_peak
+
+    def measure(step):
+        # Первый вызов кладёт кортеж результата в список свободных, иначе
+        # кортеж второго вызова выделялся бы после чтения счётчика.
+        traced()
+        before = traced()[0]
+        reset()
+        step()
+        return traced()[1] - before
+
+    def noop():
+        pass
+
+    for _ in range(warmup):
+        for step in steps:
+            step()
+        between(None)
+    peaks = [0] * len(steps)
+    calibration = itertools.repeat(None, 64)
+    window = itertools.repeat(None, frames)
+    tracemalloc.start()
+    # Балласт держит счётчик трассировки выше кэша малых int: иначе чтение
+    # счётчика то создаёт int, то нет, и ноль шкалы плывёт.
+    ballast = bytearray(4096)
+    try:
+        zero = None
+        for _ in calibration:
+            peak = measure(noop)
+            if zero is None or peak < zero:
+                zero = peak
+        for _ in window:
+            i = 0
+            while i < len(steps):
+                peaks[i] = measure(steps[i]) - zero
+                i += 1
+            between(peaks)
+    finally:
+        del ballast
+        tracemalloc.stop()
+
+
+def check_allocations(argv=None):
+    # Горячий цикл кадра: ввод, тик гравитации, столкновения, тень и, если
+    # есть дисплей, отрисовка. Замер идёт по всем кадрам долгой сессии, без
+    # выбора удобных окон: партии длинные и перезапускаются, счётчики
+    # растут как в настоящей игре.
+    import argparse
+    import random
+    import sys
+    import tkinter as tk
+    from engine import Game
+
+    parser = argparse.ArgumentParser(description="Проверка выделений памяти в цикле кадра")
+    parser.add_argument('--frames', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--renderer', default='canvas')
+    parser.add_argument('--frame-tolerance', type=int, default=FRAME_TOLERANCE,
+                        help="допустимый пик кадра без фиксации, байт")
+    parser.add_argument('--lock-tolerance', type=int, default=LOCK_TOLERANCE,
+                        help="допустимый пик кадра с фиксацией, байт")
+    args = parser.parse_args(argv)
+
+    game = Game(seed=args.seed)
+    engine = game.engine
+    renderer = None
+    try:
+        from tetris import RENDERERS, TILE_SIZE
+        root = tk.Tk()
+        canvas = tk.Canvas(root, width=engine.width * TILE_SIZE, height=engine.height * TILE_SIZE)
+        canvas.pack()
+        renderer = RENDERERS[args.renderer](canvas, 0, 0, TILE_SIZE, engine.width, engine.height)
+        renderer.subscribe(engine.events)
+        renderer.render(engine, engine.calculate_shadow())
+    except tk.TclError as e:
+        print(f"Нет дисплея, отрисовка не замеряется: {e}")
+
+    report = check_session(game, random.Random(args.seed), args.frames, renderer)
+    print(f"{args.frames} кадров до тика {report['ticks']}, фиксаций {report['locks']}: "
+          f"пик {report['frame']} Б без фиксации, {report['lock']} Б с фиксацией")
+    if renderer is not None:
+        print(f"Отрисовка ({args.renderer}): пик {report['render']} Б за кадр (вызовы Tk, не проверяется)")
+    failed = False
+    if report['frame'] > args.frame_tolerance:
+        print(f"Кадр выделяет память: пик {report['frame']} Б > {args.frame_tolerance} Б")
+        failed = True
+    if report['lock'] > args.lock_tolerance:
+        print(f"Фиксация выделяет память: пик {report['lock']} Б > {args.lock_tolerance} Б")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+def check_session(game, rng, frames, renderer=None, hold=0.01, warmup=2000):
+    # Наибольшие пики кадров с фиксацией фигуры и без неё за frames кадров
+    # одной сессии. Играет автопилот с жадным поиском на одну фигуру, чтобы
+    # партии шли долго и счётчики успевали вырасти; поверх него изредка
+    # зажимаются стрелки, чтобы работали автоповтор и ускоренное падение.
+    # Клавиши нажимаются между кадрами, как из обработчика Tk.
+    from lookahead import Autopilot, Lookahead
+
+    engine = game.engine
+    autopilot = Autopilot(Lookahead(engine.width, engine.height, depth=1, beam=1))
+    report = {'frame': 0, 'lock': 0, 'render': 0, 'locks': 0, 'ticks': 0}
+    state = {'pieces': engine.pieces, 'held': None}
+
+    def frame():
+        game.tick()
+        if game.dirty:
+            engine.calculate_shadow()
+
+    def draw():
+        if game.dirty:
+            renderer.update(engine, engine.shadow)
+
+    def between(peaks):
+        if peaks is not None:
+            if engine.pieces != state['pieces']:
+                report['locks'] += 1
+                report['lock'] = max(report['lock'], peaks[0])
+            else:
+                report['frame'] = max(report['frame'], peaks[0])
+                if renderer is not None:
+                    report['render'] = max(report['render'], peaks[1])
+            report['ticks'] = max(report['ticks'], game.ticks)
+        game.dirty = False
+        if engine.game_over:
+            game.restart(rng.randrange(1 << 32))
+            state['held'] = None
+            if renderer is not None:
+                renderer.render(engine, engine.calculate_shadow())
+        state['pieces'] = engine.pieces
+
+        if state['held'] is not None:
+            if rng.random() < 0.1:
+                game.key_release(state['held'])
+                state['held'] = None
+        elif rng.random() < hold:
+            state['held'] = rng.choice(('Left', 'Right', 'Down'))
+            game.key_press(state['held'])
+        key = autopilot.next_key(engine)
+        if key is not None and key != state['held']:
+            game.key_press(key)
+            game.key_release(key)
+
+    steps = (frame,) if renderer is None else (frame, draw)
+    frame_peaks(steps, frames, between, warmup)
+    return report
@@ -0,0 +1,157 @@
+import argparse
+import io
+import time
+
+from engine import Game
+
+MAGIC = b'TRPL'
+VERSION = 1
+
+
+def write_varint(stream, value):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            stream.write(bytes((byte | 0x80,)))
+        else:
+            stream.write(bytes((byte,)))
+            return
+
+
+def read_varint(stream):
+    value = 0
+    shift = 0
+    while True:
+        data = stream.read(1)
+        if not data:
+            raise EOFError("Повтор обрывается посреди числа")
+        value |= (data[0] & 0x7F) << shift
+        if data[0] < 0x80:
+            return value
+        shift += 7
+
+
+class ReplayRecorder:
+    # Формат: MAGIC, версия, seed, ширина, высота, число событий, затем пары
+    # (приращение тика, код ввода) и номер последнего тика. Всё в varint.
+    def __init__(self):
+        self.seed = None
+        self.width = None
+        self.height = None
+        self.events = []
+        self.saved = False
+
+    def start(self, seed, width, height):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.events.clear()
+        self.saved = False
+
+    def record(self, tick, code):
+        self.events.append((tick, code))
+
+    def to_bytes(self, end_tick):
+        stream = io.BytesIO()
+        stream.write(MAGIC)
+        for value in (VERSION, self.seed, self.width, self.height, len(self.events)):
+            write_varint(stream, value)
+        last_tick = 0
+        for tick, code in self.events:
+            write_varint(stream, tick - last_tick)
+            write_varint(stream, code)
+            last_tick = tick
+        write_varint(stream, end_tick - last_tick)
+        return stream.getvalue()
+
+    def save(self, file_path, end_tick):
+        with open(file_path, 'wb') as file:
+            file.write(self.to_bytes(end_tick))
+        self.saved = True
+
+
+class Replay:
+    def __init__(self, seed, width, height, events, end_tick):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.events = events
+        self.end_tick = end_tick
+
+    @classmethod
+    def from_bytes(cls, data):
+        stream = io.BytesIO(data)
+        if stream.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Это не файл повтора")
+        version = read_varint(stream)
+        if version != VERSION:
+            raise ValueError(f"Неподдерживаемая версия повтора: {version}")
+        seed, width, height, count = (read_varint(stream) for _ in range(4))
+        events = []
+        tick = 0
+        for _ in range(count):
+            tick += read_varint(stream)
+            events.append((tick, read_varint(stream)))
+        end_tick = tick + read_varint(stream)
+        return cls(seed, width, height, events, end_tick)
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+    def play(self, until=None, on_tick=None):
+        # Пересчитывает игру без отрисовки. on_tick(game) вызывается после
+        # каждого тика и может вернуть True, чтобы остановиться раньше.
+        until = self.end_tick if until is None else min(until, self.end_tick)
+        game = Game(self.seed, self.width, self.height)
+        events = self.events
+        index = 0
+        while game.ticks < until and not game.engine.game_over:
+            while index < len(events) and events[index][0] == game.ticks:
+                game.input(events[index][1])
+                index += 1
+            game.tick()
+            if on_tick is not None and on_tick(game):
+                break
+        return game
+
+
+def show(game):
+    import tkinter as tk
+    from tetris import BoardRenderer, TILE_SIZE
+
+    root = tk.Tk()
+    root.title(f"Replay {game.seed} @ {game.ticks}")
+    canvas = tk.Canvas(
+        root,
+        width=game.engine.width * TILE_SIZE,
+        height=game.engine.height * TILE_SIZE,
+        bg='black'
+    )
+    canvas.pack()
+    BoardRenderer(canvas, 0, 0, TILE_SIZE, game.engine.width, game.engine.height).render(game.engine, game.engine.calculate_shadow())
+    root.mainloop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Воспроизведение повтора Tetris")
+    parser.add_argument('replay')
+    parser.add_argument('--until', type=int, default=None, help="остановиться на этом тике")
+    parser.add_argument('--show', action='store_true', help="показать поле в окне")
+    args = parser.parse_args(argv)
+
+    replay = Replay.load(args.replay)
+    start = time.perf_counter()
+    game = replay.play(args.until)
+    elapsed = time.perf_counter() - start
+    print(f"seed={replay.seed} ticks={game.ticks} pieces={game.engine.pieces} "
+          f"lines={game.engine.lines} score={game.engine.score} "
+          f"game_over={game.engine.game_over} time={elapsed:.3f}s")
+    if args.show:
+        show(game)
+
+
+if __name__ == "__main__":
+    main()
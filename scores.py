@@ -0,0 +1,182 @@
+import json
+import os
+import queue
+import threading
+import time
+
+
+class ScoreStore:
+    # Снимок лежит в high_score.json, новые результаты дописываются в журнал
+    # по строке JSON. Запись идёт в фоновом потоке пачками; снимок
+    # обновляется атомарно (временный файл + os.replace). Первая строка
+    # журнала хранит поколение снимка, поверх которого он пишется, поэтому
+    # после сбоя между заменой снимка и очисткой журнала записи не
+    # учитываются дважды. Оборванная последняя строка пропускается.
+    # Состояние меняет только фоновый поток под lock, окно читает его
+    # копию через top().
+    def __init__(self, path="high_score.json", log_path=None, top_n=10, compact_every=20):
+        self.path = path
+        self.log_path = log_path or os.path.splitext(path)[0] + ".log"
+        self.top_n = top_n
+        self.compact_every = compact_every
+        self.lock = threading.Lock()
+        self.loaded = threading.Event()
+        self.leaderboard = []
+        self.totals = {'games': 0, 'pieces': 0, 'lines': 0, 'duration': 0.0}
+        self.high_score = 0
+        self.generation = 0
+        self.logged = 0
+
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                snapshot = json.load(file)
+        except FileNotFoundError:
+            snapshot = {}
+        except (OSError, ValueError) as e:
+            print(f"Ошибка чтения рекордов: {e}")
+            snapshot = {}
+        with self.lock:
+            self.high_score = snapshot.get('high_score', 0)
+            self.generation = snapshot.get('generation', 0)
+            self.leaderboard = snapshot.get('leaderboard', [])
+            self.totals.update(snapshot.get('totals', {}))
+
+        try:
+            with open(self.log_path, 'r', encoding='utf-8') as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            lines = []
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get('generation') != self.generation:
+            self.start_log()
+            return
+        valid = lines[:1]
+        for line in lines[1:]:
+            if not line.endswith("\n"):
+                break
+            try:
+                session = json.loads(line)
+            except ValueError:
+                break
+            with self.lock:
+                self.apply(session)
+            valid.append(line)
+            self.logged += 1
+        if len(valid) < len(lines):
+            self.rewrite_log(valid)
+
+    def rewrite_log(self, lines):
+        temp_path = self.log_path + ".tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                file.writelines(lines)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.log_path)
+        except OSError as e:
+            print(f"Ошибка записи рекордов: {e}")
+
+    def start_log(self):
+        try:
+            with open(self.log_path, 'w', encoding='utf-8') as file:
+                file.write(json.dumps({'generation': self.generation}) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+        except OSError as e:
+            print(f"Ошибка записи рекордов: {e}")
+        self.logged = 0
+
+    def apply(self, session):
+        self.high_score = max(self.high_score, session['score'])
+        self.leaderboard.append(session)
+        self.leaderboard.sort(key=lambda entry: entry['score'], reverse=True)
+        del self.leaderboard[self.top_n:]
+        self.totals['games'] += 1
+        self.totals['pieces'] += session['pieces']
+        self.totals['lines'] += session['lines']
+        self.totals['duration'] += session['duration']
+
+    def record_game(self, score, lines, pieces, duration):
+        self.requests.put({
+            'score': score,
+            'lines': lines,
+            'pieces': pieces,
+            'duration': round(duration, 3),
+            'pps': round(pieces / duration, 3) if duration > 0 else 0.0,
+            'date': time.strftime("%Y-%m-%d %H:%M:%S")
+        })
+
+    def top(self):
+        with self.lock:
+            return list(self.leaderboard)
+
+    def busy(self):
+        # Загрузка ещё идёт или в очереди есть незаписанные партии.
+        return not self.loaded.is_set() or self.requests.unfinished_tasks > 0
+
+    def run(self):
+        # Чтение снимка и журнала, а при обрыве и перезапись журнала с
+        # fsync, идут уже в фоновом потоке: окно игры их не ждёт. Запросы,
+        # пришедшие раньше, ждут в очереди и применяются поверх загруженного.
+        self.load()
+        self.loaded.set()
+        while True:
+            batch = [self.requests.get()]
+            while True:
+                try:
+                    batch.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            sessions = [session for session in batch if session is not None]
+            try:
+                if sessions:
+                    self.append(sessions)
+                if self.logged >= self.compact_every or (stop and self.logged):
+                    self.compact()
+            except OSError as e:
+                print(f"Ошибка записи рекордов: {e}")
+            for _ in batch:
+                self.requests.task_done()
+            if stop:
+                return
+
+    def append(self, sessions):
+        with open(self.log_path, 'a', encoding='utf-8') as file:
+            for session in sessions:
+                file.write(json.dumps(session) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        with self.lock:
+            for session in sessions:
+                self.apply(session)
+        self.logged += len(sessions)
+
+    def compact(self):
+        with self.lock:
+            snapshot = {
+                'generation': self.generation + 1,
+                'high_score': self.high_score,
+                'leaderboard': list(self.leaderboard),
+                'totals': dict(self.totals)
+            }
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(snapshot, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        self.generation += 1
+        self.start_log()
+
+    def close(self, timeout=2.0):
+        self.requests.put(None)
+        self.worker.join(timeout)
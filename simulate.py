@@ -0,0 +1,215 @@
+import argparse
+import importlib
+import json
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import Engine, ROTATIONS
+
+
+def placements(engine):
+    piece = engine.current_piece
+    for rotation, state in enumerate(ROTATIONS[piece.kind]):
+        for x in range(engine.width - state.width + 1):
+            if not engine.collides(state, x, piece.y):
+                yield rotation, state, x, engine.drop_y(state, x, piece.y)
+
+
+def lock_rows(engine, state, x, y):
+    rows = list(engine.rows)
+    for r, mask in enumerate(state.masks):
+        if 0 <= y + r < engine.height:
+            rows[y + r] |= mask << x
+    full = engine.full_row
+    cleared = [r for r in range(state.height) if 0 <= y + r < engine.height and rows[y + r] == full]
+    eroded = len(cleared) * sum(state.masks[r].bit_count() for r in cleared)
+    if cleared:
+        kept = [row for row in rows if row != full]
+        rows = [0] * (engine.height - len(kept)) + kept
+    return rows, eroded
+
+
+def board_features(rows, width):
+    full = (1 << width) - 1
+    walls = 1 | (1 << (width + 1))
+    row_transitions = 0
+    column_transitions = 0
+    holes = 0
+    wells = 0
+    cover = 0
+    above = 0
+    depth = [0] * width
+    for row in rows:
+        bordered = (row << 1) | walls
+        row_transitions += ((bordered ^ (bordered >> 1)) & ((1 << (width + 1)) - 1)).bit_count()
+        column_transitions += (row ^ above).bit_count()
+        holes += (~row & cover & full).bit_count()
+        cover |= row
+        above = row
+
+        well = ~row & ((row << 1) | 1) & ((row >> 1) | (1 << (width - 1))) & full
+        for x in range(width):
+            if well >> x & 1:
+                depth[x] += 1
+                wells += depth[x]
+            else:
+                depth[x] = 0
+    column_transitions += (above ^ full).bit_count()
+    return row_transitions, column_transitions, holes, wells
+
+
+def dellacherie_policy(engine, rng):
+    best = None
+    best_score = None
+    for rotation, state, x, y in placements(engine):
+        rows, eroded = lock_rows(engine, state, x, y)
+        row_transitions, column_transitions, holes, wells = board_features(rows, engine.width)
+        landing_height = engine.height - y - (state.height - 1) / 2
+        score = (
+            -landing_height
+            + eroded
+            - row_transitions
+            - column_transitions
+            - 4 * holes
+            - wells
+        )
+        if best_score is None or score > best_score:
+            best = (rotation, x)
+            best_score = score
+    return best
+
+
+def random_policy(engine, rng):
+    options = [(rotation, x) for rotation, state, x, y in placements(engine)]
+    return rng.choice(options) if options else None
+
+
+def lookahead_policy(engine, rng):
+    from lookahead import policy
+    return policy(engine, rng)
+
+
+POLICIES = {
+    'dellacherie': dellacherie_policy,
+    'lookahead': lookahead_policy,
+    'random': random_policy
+}
+
+
+def load_policy(name):
+    if name in POLICIES:
+        return POLICIES[name]
+    module_name, _, attr = name.partition(':')
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def run_game(seed, policy_name, max_pieces):
+    policy = load_policy(policy_name)
+    engine = Engine(rng=random.Random(seed))
+    policy_rng = random.Random(seed ^ 0x5EED)
+    table = None
+    if policy_name == 'lookahead':
+        # Таблица переходов одна на процесс и копится между партиями,
+        # поэтому для партии берётся разница счётчиков.
+        from lookahead import get_searcher
+        table = get_searcher(engine.width, engine.height).table
+        before = table.stats()
+    start = time.perf_counter()
+    while not engine.game_over and engine.pieces < max_pieces:
+        move = policy(engine, policy_rng)
+        if move is None or engine.place(*move) is None:
+            engine.game_over = True
+    result = {
+        'seed': seed,
+        'score': engine.score,
+        'lines': engine.lines,
+        'pieces': engine.pieces,
+        'seconds': time.perf_counter() - start
+    }
+    if table is not None:
+        after = table.stats()
+        result['table'] = {key: after[key] - before[key] for key in ('hits', 'misses', 'evictions')}
+    return result
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def distribution(values):
+    return {
+        'mean': statistics.fmean(values),
+        'stdev': statistics.pstdev(values),
+        'min': min(values),
+        'p25': percentile(values, 0.25),
+        'median': statistics.median(values),
+        'p75': percentile(values, 0.75),
+        'p90': percentile(values, 0.9),
+        'max': max(values)
+    }
+
+
+def simulate(games, policy_name='dellacherie', seed=0, workers=None, max_pieces=2000):
+    workers = workers or os.cpu_count() or 1
+    seeds = [seed + i for i in range(games)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            run_game,
+            seeds,
+            [policy_name] * games,
+            [max_pieces] * games,
+            chunksize=max(1, games // (workers * 4))
+        ))
+    wall_time = time.perf_counter() - start
+
+    pieces = sum(result['pieces'] for result in results)
+    report = {
+        'games': games,
+        'policy': policy_name,
+        'seed': seed,
+        'workers': workers,
+        'max_pieces': max_pieces,
+        'wall_time': wall_time,
+        'pieces': pieces,
+        'pieces_per_second': pieces / wall_time if wall_time else 0.0,
+        'lines_cleared': sum(result['lines'] for result in results),
+        'lines': distribution([result['lines'] for result in results]),
+        'score': distribution([result['score'] for result in results]),
+        'results': results
+    }
+    tables = [result['table'] for result in results if 'table' in result]
+    if tables:
+        table = {key: sum(entry[key] for entry in tables) for key in ('hits', 'misses', 'evictions')}
+        lookups = table['hits'] + table['misses']
+        table['hit_rate'] = table['hits'] / lookups if lookups else 0.0
+        report['table'] = table
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Tetris self-play")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--policy', default='dellacherie',
+                        help="dellacherie, lookahead, random or module:function")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-pieces', type=int, default=2000)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args(argv)
+
+    report = simulate(args.games, args.policy, args.seed, args.workers, args.max_pieces)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Клавиши для синтетического ввода: сброс чаще остальных, чтобы партии
+# заканчивались быстро, но движение и поворот тоже проходят через цикл.
+SOAK_KEYS = ('space',) * 4 + ('Left', 'Right', 'Up', 'Down')
+
+# Допустимый прирост метрики между первой и последней третью замеров:
+# (абсолютный, доля от начального значения). Счётчики Tk расти не должны.
+LIMITS = {
+    'widgets': (0, 0.0),
+    'items': (0, 0.0),
+    'images': (0, 0.0),
+    'objects': (500, 0.01),
+    'traced_kb': (256, 0.05),
+    'rss_kb': (4096, 0.10)
+}
+
+
+def start_xvfb(screen="1024x768x24", timeout=10.0):
+    xvfb = shutil.which('Xvfb')
+    if xvfb is None:
+        return None
+    number = 99
+    while os.path.exists(f"/tmp/.X{number}-lock") or os.path.exists(f"/tmp/.X11-unix/X{number}"):
+        number += 1
+    process = subprocess.Popen(
+        [xvfb, f":{number}", '-screen', '0', screen, '-nolisten', 'tcp'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(f"/tmp/.X11-unix/X{number}"):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            return None
+        time.sleep(0.05)
+    os.environ['DISPLAY'] = f":{number}"
+    return process
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/statm") as file:
+            resident = int(file.read().split()[1])
+        return resident * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        # Без /proc остаётся только пиковое значение.
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def walk(widget):
+    yield widget
+    for child in widget.winfo_children():
+        yield from walk(child)
+
+
+def growth(values):
+    # Медиана последней трети против медианы первой: одиночные всплески
+    # (сборка мусора, кэш шрифтов Tk) не дают ложной тревоги.
+    third = max(1, len(values) // 3)
+    return statistics.median(values[-third:]) - statistics.median(values[:third])
+
+
+class Soak:
+    # Сценарий — генератор: каждый yield отдаёт управление циклу Tk на
+    # interval мс, поэтому игра идёт своим GameLoop, как у живого игрока.
+    def __init__(self, root, manager, menu, games, warmup, sample_every, interval, seed):
+        self.root = root
+        self.manager = manager
+        self.menu = menu
+        self.games = games
+        self.warmup = warmup
+        self.sample_every = sample_every
+        self.interval = interval
+        self.rng = random.Random(seed)
+        self.samples = []
+        self.snapshot = None
+        self.started = time.monotonic()
+        self.steps = self.script()
+
+    def run(self):
+        self.root.after(self.interval, self.step)
+        self.root.mainloop()
+
+    def step(self):
+        try:
+            delay = next(self.steps)
+        except StopIteration:
+            self.root.quit()
+            return
+        self.root.after(self.interval if delay is None else delay, self.step)
+
+    def key(self, keysym):
+        self.root.event_generate('<KeyPress>', keysym=keysym)
+        self.root.event_generate('<KeyRelease>', keysym=keysym)
+
+    def script(self):
+        self.menu.play_button.invoke()
+        yield
+        game = self.menu.game
+        for number in range(1, self.games + 1):
+            while not game.engine.game_over:
+                self.key(self.rng.choice(SOAK_KEYS))
+                yield
+            self.after_game(number)
+            options = self.manager.get('options')
+            route = number % 4
+            if route == 0:
+                game.restart_button.invoke()
+            elif route == 1:
+                game.menu_button.invoke()
+                yield
+                self.menu.play_button.invoke()
+            elif route == 2:
+                game.options_button.invoke()
+                yield
+                yield from self.toggle(options)
+                options.replay_button.invoke()
+            else:
+                game.menu_button.invoke()
+                yield
+                self.menu.options_button.invoke()
+                yield
+                yield from self.toggle(options)
+                options.exit_button.invoke()
+                yield
+                self.menu.play_button.invoke()
+            yield
+
+    def toggle(self, options):
+        # Каждый переключатель нажимается дважды, настройки не меняются.
+        for button in (options.music_button, options.music_button, options.sound_button, options.sound_button):
+            button.invoke()
+            yield
+
+    def after_game(self, number):
+        if number <= self.warmup or (number - self.warmup) % self.sample_every:
+            return
+        gc.collect()
+        traced, _ = tracemalloc.get_traced_memory()
+        widgets = list(walk(self.root))
+        sample = {
+            'games': number,
+            'seconds': round(time.monotonic() - self.started, 1),
+            'rss_kb': rss_kb(),
+            'traced_kb': traced // 1024,
+            'objects': len(gc.get_objects()),
+            'widgets': len(widgets),
+            'items': sum(len(widget.find_all()) for widget in widgets if widget.winfo_class() == 'Canvas'),
+            'images': len(self.root.image_names())
+        }
+        self.samples.append(sample)
+        if self.snapshot is None:
+            self.snapshot = tracemalloc.take_snapshot()
+        print("  ".join(f"{key} {value}" for key, value in sample.items()), flush=True)
+
+    def verdict(self):
+        failures = []
+        for metric, (absolute, relative) in LIMITS.items():
+            values = [sample[metric] for sample in self.samples]
+            increase = growth(values)
+            if increase > max(absolute, values[0] * relative):
+                failures.append((metric, values[0], increase))
+        return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Долгий прогон Tetris с поиском утечек")
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--warmup', type=int, default=20, help="партии до первого замера (прогрев кэшей)")
+    parser.add_argument('--sample-every', type=int, default=10)
+    parser.add_argument('--interval', type=int, default=15, help="пауза между синтетическими событиями, мс")
+    parser.add_argument('--renderer', default='canvas')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--xvfb', action='store_true', help="всегда запускать свой Xvfb")
+    parser.add_argument('--output', help="сохранить замеры в JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.xvfb or not os.environ.get('DISPLAY'):
+        server = start_xvfb()
+        if server is None:
+            print("Нет дисплея и не удалось запустить Xvfb")
+            return 2
+
+    # Повторы, рекорды и профили прогона пишутся во временный каталог,
+    # а не рядом с настоящими рекордами игрока.
+    workdir = tempfile.mkdtemp(prefix="tetris-soak-")
+    tracemalloc.start()
+    try:
+        import tkinter as tk
+        import tetris
+        from scores import ScoreStore
+
+        tetris.REPLAY_DIR = os.path.join(workdir, "replays")
+        tetris.PROFILE_DIR = os.path.join(workdir, "profiles")
+        tetris.score_store = ScoreStore(os.path.join(workdir, "high_score.json"))
+
+        root = tk.Tk()
+        manager = tetris.SceneManager(root)
+        menu = tetris.MainMenu(manager, {'renderer': args.renderer})
+        manager.add('menu', menu)
+        manager.add_lazy('options', tetris.OptionsScene)
+        manager.show('menu')
+        root.update()
+        menu.load_images()
+
+        soak = Soak(root, manager, menu, args.games, args.warmup,
+                    args.sample_every, args.interval, args.seed)
+        soak.run()
+        failures = soak.verdict() if len(soak.samples) >= 3 else None
+        if failures:
+            print("Топ прироста памяти Python:")
+            for stat in tracemalloc.take_snapshot().compare_to(soak.snapshot, 'lineno')[:10]:
+                print(f"  {stat}")
+
+        manager.close()
+        if tetris.audio is not None:
+            tetris.audio.close()
+        tetris.score_store.close()
+        if tetris.writer is not None:
+            tetris.writer.close()
+    finally:
+        tracemalloc.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'samples': soak.samples, 'failures': failures}, file, indent=2)
+    if failures is None:
+        print("Слишком мало замеров для вывода: увеличьте --games")
+        return 2
+    if failures:
+        for metric, start, increase in failures:
+            print(f"Утечка: {metric} вырос на {increase} (начало {start})")
+        return 1
+    print(f"Утечек нет: {len(soak.samples)} замеров, {args.games} партий")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import os
+import random
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import Game
+from profiler import FRAME_TOLERANCE, LOCK_TOLERANCE, check_session, frame_peaks
+
+FRAMES = 3000
+
+
+class FakeCanvas:
+    # Холст без Tk: вызовы ничего не создают, поэтому в пик отрисовки
+    # попадает только собственный код BoardRenderer.
+    def __init__(self):
+        self.items = 0
+
+    def create_image(self, *args, **kwargs):
+        self.items += 1
+        return self.items
+
+    def coords(self, item, x, y):
+        pass
+
+    def itemconfig(self, item, state=None, image=None):
+        pass
+
+    def move(self, tag, x, y):
+        pass
+
+
+class FakeAtlas:
+    def get(self, color, tile_size, ghost=False):
+        return color
+
+
+class FrameAllocationTest(unittest.TestCase):
+    # Замер идёт по всем кадрам сессии, партии перезапускаются, счётчик
+    # тиков уходит далеко за кэш малых int.
+    def session(self, seed, renderer=None, hold=0.01):
+        game = Game(seed=seed)
+        if renderer is not None:
+            renderer.subscribe(game.engine.events)
+            renderer.render(game.engine, game.engine.calculate_shadow())
+        report = check_session(game, random.Random(seed), FRAMES, renderer, hold=hold)
+        self.assertGreater(report['ticks'], 1000)
+        self.assertGreater(report['locks'], 0)
+        return report
+
+    def test_frames_within_tolerance(self):
+        for seed in range(3):
+            report = self.session(seed)
+            self.assertLessEqual(report['frame'], FRAME_TOLERANCE, f"seed {seed}")
+            self.assertLessEqual(report['lock'], LOCK_TOLERANCE, f"seed {seed}")
+
+    def test_held_keys(self):
+        # Автоповтор до стены и упор в неё: столкновения у правого края
+        # не должны создавать больших int.
+        report = self.session(1, hold=0.2)
+        self.assertLessEqual(report['frame'], FRAME_TOLERANCE)
+
+    def test_board_renderer_update(self):
+        from tetris import BoardRenderer, TILE_SIZE
+        with mock.patch('tetris.sprite_atlas', FakeAtlas()):
+            game = Game(seed=1)
+            renderer = BoardRenderer(FakeCanvas(), 0, 0, TILE_SIZE, game.engine.width, game.engine.height)
+            report = self.session(1, renderer)
+        self.assertEqual(report['render'], 0)
+
+    def test_detects_per_frame_garbage(self):
+        # Объект, созданный и сразу отброшенный в каждом кадре, прирост не
+        # меняет, но должен попасть в пик.
+        seen = []
+
+        def between(peaks):
+            if peaks is not None:
+                seen.append(peaks[0])
+
+        frame_peaks([lambda: [0] * 8], 100, between, warmup=10)
+        self.assertEqual(len(seen), 100)
+        self.assertGreater(min(seen), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
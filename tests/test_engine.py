@@ -0,0 +1,111 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import Engine, Piece, ROTATIONS, ROWS_CLEARED, PIECE_LOCKED, WINDOW_MASK
+from simulate import dellacherie_policy
+
+I_PIECE = 0
+
+
+def fill(engine, y, columns, color):
+    for x in columns:
+        engine.rows[y] |= 1 << x
+        engine.colors[y * engine.width + x] = color
+    engine.update_window(y)
+    for x in columns:
+        engine.heights[x] = max(engine.heights[x], engine.height - y)
+
+
+class EngineTest(unittest.TestCase):
+    def assertConsistent(self, engine):
+        # Цвета, высоты столбцов и окна строк выводятся из rows и должны
+        # совпадать с ними после любой фиксации и очистки.
+        width = engine.width
+        for y in range(engine.height):
+            for x in range(width):
+                filled = bool(engine.rows[y] >> x & 1)
+                self.assertEqual(filled, engine.colors[y * width + x] != 0, (x, y))
+                self.assertEqual(engine.windows[y][x], engine.rows[y] >> x & WINDOW_MASK, (x, y))
+        for x in range(width):
+            top = next((y for y in range(engine.height) if engine.rows[y] >> x & 1), engine.height)
+            self.assertEqual(engine.heights[x], engine.height - top, x)
+
+    def test_non_adjacent_rows(self):
+        # Вертикальная палка в колодце у левой стены заполняет строки 17
+        # и 19, а 16 и 18 остаются неполными и должны лечь на их место.
+        engine = Engine(rng=random.Random(0))
+        full = range(1, engine.width)
+        fill(engine, 16, [3], 4)
+        fill(engine, 17, full, 1)
+        fill(engine, 18, range(2, 6), 2)
+        fill(engine, 19, full, 3)
+        kept_16 = engine.rows[16] | 1
+        kept_18 = engine.rows[18] | 1
+        cleared = []
+        locked = []
+        engine.events.subscribe(ROWS_CLEARED, cleared.append)
+        engine.events.subscribe(PIECE_LOCKED, lambda piece, rows: locked.append(rows))
+
+        engine.current_piece = Piece(I_PIECE, 1, 5, 0, 16)
+        self.assertEqual(engine.merge_piece(), 2)
+        self.assertEqual(locked, [[16, 17, 18, 19]])
+        self.assertEqual(cleared, [[17, 19]])
+        self.assertEqual(engine.rows[19], kept_18)
+        self.assertEqual(engine.rows[18], kept_16)
+        self.assertEqual(engine.rows[:18], [0] * 18)
+        width = engine.width
+        self.assertEqual(list(engine.colors[19 * width:]), [5, 0, 2, 2, 2, 2, 0, 0, 0, 0])
+        self.assertEqual(list(engine.colors[18 * width:19 * width]), [5, 0, 0, 4, 0, 0, 0, 0, 0, 0])
+        self.assertEqual(engine.heights, [2, 0, 1, 2, 1, 1, 0, 0, 0, 0])
+        self.assertEqual(engine.lines, 2)
+        self.assertConsistent(engine)
+
+    def test_heights_after_clear_under_overhang(self):
+        # Вершина столбца стоит в убранной строке, а ниже под ней пусто:
+        # высота должна упасть до следующей занятой клетки, а не на число
+        # убранных строк.
+        engine = Engine(rng=random.Random(0))
+        fill(engine, 17, range(1, engine.width), 1)
+        fill(engine, 19, [2], 2)
+        engine.current_piece = Piece(I_PIECE, 1, 5, 0, 14)
+        self.assertEqual(engine.merge_piece(), 1)
+        self.assertEqual(engine.heights[:3], [5, 0, 1])
+        self.assertConsistent(engine)
+
+    def test_session_stays_consistent(self):
+        lines = 0
+        for seed in range(4):
+            engine = Engine(rng=random.Random(seed))
+            rng = random.Random(seed)
+            for _ in range(150):
+                move = dellacherie_policy(engine, rng)
+                if move is None:
+                    break
+                piece = engine.current_piece
+                piece.rotation, piece.x = move
+                piece.y = engine.drop_y(ROTATIONS[piece.kind][piece.rotation], piece.x, piece.y)
+                engine.merge_piece()
+                self.assertConsistent(engine)
+                if engine.game_over:
+                    break
+            lines += engine.lines
+        self.assertGreater(lines, 10)
+
+    def test_unsubscribe(self):
+        engine = Engine(rng=random.Random(0))
+        cleared = []
+        engine.events.subscribe(ROWS_CLEARED, cleared.append)
+        engine.events.unsubscribe(ROWS_CLEARED, cleared.append)
+        engine.events.unsubscribe(ROWS_CLEARED, cleared.append)
+        fill(engine, 19, range(1, engine.width), 1)
+        engine.current_piece = Piece(I_PIECE, 1, 5, 0, 16)
+        self.assertEqual(engine.merge_piece(), 1)
+        self.assertEqual(cleared, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import copy
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import Engine, ROTATIONS
+from placement import board_array, evaluate_placements
+from simulate import random_policy
+
+
+def holes(engine):
+    count = 0
+    for x in range(engine.width):
+        covered = False
+        for y in range(engine.height):
+            if engine.rows[y] >> x & 1:
+                covered = True
+            elif covered:
+                count += 1
+    return count
+
+
+def play(engine, rng, pieces):
+    # Случайные ходы, чтобы на поле были навесы, дыры и неровная поверхность.
+    for _ in range(pieces):
+        move = random_policy(engine, rng)
+        if move is None or engine.game_over:
+            return
+        piece = engine.current_piece
+        piece.rotation, piece.x = move
+        piece.y = engine.drop_y(ROTATIONS[piece.kind][piece.rotation], piece.x, piece.y)
+        engine.merge_piece()
+
+
+class PlacementTest(unittest.TestCase):
+    def check_against_engine(self, engine):
+        result = evaluate_placements(engine)
+        piece = engine.current_piece
+        states = ROTATIONS[piece.kind]
+        checked = 0
+        for i in range(len(result['x'])):
+            rotation = int(result['rotation'][i])
+            x = int(result['x'][i])
+            state = states[rotation]
+            self.assertEqual(bool(result['valid'][i]), not engine.collides(state, x, piece.y))
+            if not result['valid'][i]:
+                continue
+            landing = engine.drop_y(state, x, piece.y)
+            self.assertEqual(int(result['landing_row'][i]), landing, (rotation, x))
+
+            merged = copy.deepcopy(engine)
+            placed = merged.current_piece
+            placed.rotation, placed.x, placed.y = rotation, x, landing
+            self.assertEqual(int(result['lines'][i]), merged.merge_piece(), (rotation, x))
+            self.assertEqual(int(result['holes'][i]), holes(merged), (rotation, x))
+            checked += 1
+        return checked
+
+    def test_matches_drop_and_merge(self):
+        rng = random.Random(7)
+        checked = 0
+        for seed in range(6):
+            engine = Engine(rng=random.Random(seed))
+            for _ in range(12):
+                play(engine, rng, 3)
+                if engine.game_over:
+                    break
+                checked += self.check_against_engine(engine)
+        self.assertGreater(checked, 500)
+
+    def test_line_clears(self):
+        # Колодец под вертикальную палку: четыре строки уходят разом.
+        engine = Engine(rng=random.Random(0))
+        for y in range(engine.height - 4, engine.height):
+            engine.rows[y] = engine.full_row & ~1
+            engine.update_window(y)
+        for x in range(1, engine.width):
+            engine.heights[x] = 4
+        engine.current_piece.kind = 0
+        engine.current_piece.rotation = 0
+        result = evaluate_placements(engine)
+        self.assertEqual(int(result['lines'].max()), 4)
+        self.check_against_engine(engine)
+
+    def test_wide_board(self):
+        engine = Engine(width=70, height=24, rng=random.Random(3))
+        play(engine, random.Random(3), 40)
+        rows = board_array(engine.rows, engine.width)
+        for y in range(engine.height):
+            for x in range(engine.width):
+                self.assertEqual(bool(rows[y, x]), bool(engine.rows[y] >> x & 1))
+        self.assertGreater(self.check_against_engine(engine), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
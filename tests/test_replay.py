@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import Game, GAME_OVER, GRAVITY_TICKS
+from replay import Replay, ReplayRecorder
+
+
+class ReplayRoundTripTest(unittest.TestCase):
+    # Повтор пишется так же, как в окне: байты снимаются в обработчике
+    # GAME_OVER, а при выходе в меню — после последнего тика.
+    def record(self, seed, keys):
+        recorder = ReplayRecorder()
+        game = Game(seed=seed, recorder=recorder)
+        saved = []
+        game.engine.events.subscribe(GAME_OVER, lambda: saved.append(recorder.to_bytes(game.ticks)))
+        for tick, key in enumerate(keys):
+            if game.engine.game_over:
+                break
+            if key is not None:
+                game.key_press(key)
+                game.key_release(key)
+            game.tick()
+        if not saved:
+            saved.append(recorder.to_bytes(game.ticks))
+        return game, Replay.from_bytes(saved[0]).play()
+
+    def assertSameGame(self, live, replayed):
+        self.assertEqual(replayed.ticks, live.ticks)
+        self.assertEqual(replayed.engine.game_over, live.engine.game_over)
+        self.assertEqual(replayed.engine.pieces, live.engine.pieces)
+        self.assertEqual(replayed.engine.score, live.engine.score)
+        self.assertEqual(replayed.engine.rows, live.engine.rows)
+        self.assertEqual(replayed.engine.colors, live.engine.colors)
+
+    def test_game_ending_on_hard_drop(self):
+        # Только сбросы: партия кончается вводом, а не гравитацией.
+        for seed in range(5):
+            live, replayed = self.record(seed, ['space'] * 2000)
+            self.assertTrue(live.engine.game_over)
+            self.assertSameGame(live, replayed)
+
+    def test_game_ending_on_gravity(self):
+        live, replayed = self.record(7, [None] * (GRAVITY_TICKS * 2000))
+        self.assertTrue(live.engine.game_over)
+        self.assertSameGame(live, replayed)
+
+    def test_unfinished_game(self):
+        keys = ['Left', None, 'Up', None, 'Right', None, 'Down', None] * 20
+        live, replayed = self.record(3, keys)
+        self.assertFalse(live.engine.game_over)
+        self.assertSameGame(live, replayed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scores import ScoreStore
+
+
+def session(score, lines=1, pieces=10, duration=5.0):
+    return {'score': score, 'lines': lines, 'pieces': pieces, 'duration': duration,
+            'pps': 2.0, 'date': "2026-01-01 00:00:00"}
+
+
+class ScoreRecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "high_score.json")
+        self.log_path = os.path.join(self.directory, "high_score.log")
+
+    def write_snapshot(self, generation, sessions):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump({
+                'generation': generation,
+                'high_score': max((s['score'] for s in sessions), default=0),
+                'leaderboard': sessions,
+                'totals': {'games': len(sessions), 'pieces': 0, 'lines': 0, 'duration': 0.0}
+            }, file)
+
+    def write_log(self, text):
+        with open(self.log_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+
+    def read_log(self):
+        with open(self.log_path, 'r', encoding='utf-8') as file:
+            return file.readlines()
+
+    def open_store(self):
+        store = ScoreStore(self.path, top_n=5)
+        self.addCleanup(store.close)
+        self.assertTrue(store.loaded.wait(5))
+        return store
+
+    def test_torn_last_line(self):
+        # Сбой посреди дописывания: последняя строка журнала без конца.
+        self.write_snapshot(1, [session(300)])
+        self.write_log(json.dumps({'generation': 1}) + "\n"
+                       + json.dumps(session(500)) + "\n"
+                       + json.dumps(session(900))[:20])
+        store = self.open_store()
+        self.assertEqual([entry['score'] for entry in store.top()], [500, 300])
+        self.assertEqual(store.high_score, 500)
+        self.assertEqual(len(self.read_log()), 2)
+
+        store.record_game(700, 2, 20, 10.0)
+        store.requests.join()
+        self.assertEqual([entry['score'] for entry in store.top()], [700, 500, 300])
+        lines = self.read_log()
+        self.assertEqual([json.loads(line)['score'] for line in lines[1:]], [500, 700])
+
+    def test_stale_log_generation(self):
+        # Сбой после замены снимка, но до очистки журнала: журнал написан
+        # поверх прошлого поколения, его записи уже в снимке.
+        self.write_snapshot(3, [session(800), session(400)])
+        self.write_log(json.dumps({'generation': 2}) + "\n" + json.dumps(session(400)) + "\n")
+        store = self.open_store()
+        self.assertEqual([entry['score'] for entry in store.top()], [800, 400])
+        self.assertEqual(store.totals['games'], 2)
+        self.assertEqual(self.read_log(), [json.dumps({'generation': 3}) + "\n"])
+
+    def test_top_is_a_copy(self):
+        store = self.open_store()
+        store.record_game(100, 1, 5, 3.0)
+        store.requests.join()
+        top = store.top()
+        top.clear()
+        self.assertEqual(len(store.top()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
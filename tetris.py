@@ -1,100 +1,770 @@
+import time
+STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import messagebox
-from PIL import Image, ImageTk
-import random
 import os
-import pyglet
+from collections import OrderedDict
+import importlib
+import queue
 import threading
-import time
 
-WIDTH = 10
-HEIGHT = 20
+import bundle
+from engine import (Game, WIDTH, HEIGHT, COLORS, TICK_RATE, Piece, piece_state,
+                    PIECE_LOCKED, ROWS_CLEARED, SCORE_CHANGED, GAME_OVER)
+
 TILE_SIZE = 30
-FPS = 3
+FIELD_WIDTH = 300
+FIELD_HEIGHT = 600
+REPLAY_DIR = "replays"
+PROFILE_DIR = "profiles"
+LATENCY_EXPORTS = 20
+MIN_SCALE = 0.25
+LEADERBOARD_SHOWN = 5
 
-COLORS = ['cyan', 'blue', 'orange', 'yellow', 'green', 'purple', 'red']
+GAME_MODULES = ('replay', 'profiler', 'scores')
 
-SHAPES = [
-    [[1, 1, 1, 1]],
-    [[1, 1, 1], [0, 1, 0]],
-    [[1, 1], [1, 1]],
-    [[1, 1, 0], [0, 1, 1]],
-    [[0, 1, 1], [1, 1, 0]],
-    [[1, 1, 1], [1, 0, 0]],
-    [[1, 1, 1], [0, 0, 1]]
-]
+Image = ImageColor = ImageDraw = ImageTk = None
 
-def play_sound(file_path):
-    if not os.path.exists(file_path):
-        print(f"Файл {file_path} не найден!")
-        return
+def load_pil():
+    # PIL нужен только для картинок, поэтому импортируется при первой из них.
+    global Image, ImageColor, ImageDraw, ImageTk
+    if Image is None:
+        from PIL import Image, ImageColor, ImageDraw, ImageTk
+
+class ImageCache:
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self.images = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.prepared = {}
+        self.lock = threading.Lock()
+
+    def get(self, path, size, resample=None):
+        key = (path, size, resample)
+        photo = self.images.get(key)
+        if photo is not None:
+            self.images.move_to_end(key)
+            self.hits += 1
+            return photo
+        
+        self.misses += 1
+        with self.lock:
+            image = self.prepared.pop(key, None)
+        if image is None:
+            image = self.load(path, size, resample)
+        photo = ImageTk.PhotoImage(image)
+        self.images[key] = photo
+        if len(self.images) > self.max_size:
+            self.images.popitem(last=False)
+        return photo
+
+    def load(self, path, size, resample):
+        load_pil()
+        # Из пакета картинка приходит уже нужного размера: ни декодирования,
+        # ни масштабирования, только обёртка над отображённой памятью.
+        assets = load_assets()
+        if assets is not None:
+            packed = assets.image(path, size)
+            if packed is not None:
+                return Image.frombuffer('RGBA', packed[0], packed[1], 'raw', 'RGBA', 0, 1)
+            path = assets.resolve(path)
+        else:
+            path = bundle.find_source(path)
+        resample = getattr(Image.Resampling, resample.upper()) if resample else None
+        return Image.open(path).resize(size, resample)
+
+    def prepare(self, path, size, resample=None):
+        # JPEG и PNG можно декодировать и масштабировать в фоновом потоке;
+        # PhotoImage создаётся только в потоке Tk, поэтому это делает get.
+        key = (path, size, resample)
+        if key in self.images or key in self.prepared:
+            return
+        try:
+            image = self.load(path, size, resample)
+            image.load()
+        except OSError:
+            return
+        with self.lock:
+            self.prepared[key] = image
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.images)}
+
+image_cache = ImageCache()
+
+asset_bundle = None
+asset_bundle_loaded = False
+
+def load_assets():
+    global asset_bundle, asset_bundle_loaded
+    if not asset_bundle_loaded:
+        asset_bundle = bundle.load_bundle()
+        asset_bundle_loaded = True
+    return asset_bundle
+
+def start_prefetch(startup=None):
+    # Пока видно меню, фоновый поток готовит то, что нужно дальше: картинки
+    # меню, игры и настроек и модули игры. pyglet грузит поток звука.
+    def run():
+        start = time.perf_counter()
+        for path, size, resample in bundle.IMAGES:
+            image_cache.prepare(path, size, resample)
+        for name in GAME_MODULES:
+            importlib.import_module(name)
+        if startup is not None:
+            startup.record('prefetch', time.perf_counter() - start)
+    
+    load_assets()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+SOUND_FILES = ["sounds/sound.wav", "sounds/gameoversound.wav"]
+
+audio = None
+
+score_store = None
+
+def load_score_store():
+    global score_store
+    if score_store is None:
+        from scores import ScoreStore
+        score_store = ScoreStore("high_score.json")
+    return score_store
+
+class BackgroundWriter:
+    # Повторы и профили пишутся на диск в своём потоке, чтобы конец партии
+    # не ждал файловую систему. Задание — функция без аргументов, сама
+    # сообщающая об ошибках; None останавливает поток.
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, job):
+        self.jobs.put(job)
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            job()
+
+    def close(self, timeout=5.0):
+        self.jobs.put(None)
+        self.thread.join(timeout)
+
+writer = None
+
+def load_writer():
+    global writer
+    if writer is None:
+        writer = BackgroundWriter()
+    return writer
+
+def write_replay(file_path, data):
     try:
-        sound = pyglet.media.load(file_path)
-        sound.play()
-    except Exception as e:
-        print(f"Ошибка при воспроизведении звука: {e}")
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as file:
+            file.write(data)
+    except OSError as e:
+        print(f"Ошибка сохранения повтора: {e}")
+
+def load_audio():
+    global audio
+    if audio is None:
+        from audio import AudioEngine
+        audio = AudioEngine(SOUND_FILES, bundle=load_assets())
+    return audio
+
+def play_sound(file_path):
+    load_audio().effect(file_path)
 
-class MusicPlayer:
+class SpriteAtlas:
+    # Спрайт клетки рисуется через PIL один раз на (цвет, размер, тень).
+    # Индекс цвета 0 соответствует тени фигуры.
     def __init__(self):
-        self.player = pyglet.media.Player()
-        self.source = None
-        self.playing = False
-        self.loop = True
-        
-    def load(self, file_path):
-        if os.path.exists(file_path):
-            self.source = pyglet.media.load(file_path)
-            self.player.queue(self.source)
-            
-            @self.player.event
-            def on_eos():
-                if self.loop and self.playing:
-                    self.player.seek(0)
-                    self.player.play()
-        else:
-            print(f"Музыкальный файл {file_path} не найден!")
-            
-    def play(self):
-        if self.source and not self.playing:
-            self.player.play()
-            self.playing = True
-            
-    def pause(self):
-        if self.playing:
-            self.player.pause()
-            self.playing = False
-            
+        self.sprites = {}
+
+    def get(self, color, tile_size, ghost=False):
+        key = (color, tile_size, ghost)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            load_pil()
+            sprite = ImageTk.PhotoImage(self.draw(color, tile_size, ghost))
+            self.sprites[key] = sprite
+        return sprite
+
+    def draw(self, color, size, ghost):
+        image = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        last = size - 1
+        if ghost:
+            draw.rectangle((0, 0, last, last), fill=(128, 128, 128, 96), outline=(128, 128, 128, 255))
+            return image
+        
+        r, g, b = ImageColor.getrgb(COLORS[color - 1])
+        draw.rectangle((0, 0, last, last), fill=(r, g, b, 255), outline=(255, 255, 255, 255))
+        if size >= 8:
+            light = (min(255, r + 80), min(255, g + 80), min(255, b + 80), 255)
+            dark = (r * 3 // 5, g * 3 // 5, b * 3 // 5, 255)
+            draw.line((1, 1, last - 1, 1), fill=light)
+            draw.line((1, 1, 1, last - 1), fill=light)
+            draw.line((1, last - 1, last - 1, last - 1), fill=dark)
+            draw.line((last - 1, 1, last - 1, last - 1), fill=dark)
+        return image
+
+    def retain(self, tile_size):
+        self.sprites = {key: sprite for key, sprite in self.sprites.items() if key[1] == tile_size}
+
+sprite_atlas = SpriteAtlas()
+
+class BoardRenderer:
+    # Клетки поля — заранее созданные элементы холста, по группе на строку
+    # с общим тегом. Строка y показывает группу row_groups[y], поэтому при
+    # очистке линий группы сдвигаются целиком одним canvas.move на строку.
+    def __init__(self, canvas, padding_x, padding_y, tile_size=TILE_SIZE, width=WIDTH, height=HEIGHT):
+        self.canvas = canvas
+        self.padding_x = padding_x
+        self.padding_y = padding_y
+        self.tile_size = tile_size
+        self.width = width
+        self.height = height
+        
+        self.groups = []
+        self.group_colors = []
+        for y in range(height):
+            self.groups.append([
+                self.canvas.create_image(
+                    *self.tile_origin(x, y),
+                    anchor=tk.NW,
+                    state=tk.HIDDEN,
+                    tags=("blocks", self.group_tag(y))
+                )
+                for x in range(width)
+            ])
+            self.group_colors.append(bytearray(width))
+        self.row_groups = list(range(height))
+        self.dirty_rows = set()
+        self.place_grid()
+        
+        self.shadow_items = [
+            self.canvas.create_image(
+                0, 0, anchor=tk.NW,
+                image=sprite_atlas.get(0, tile_size, ghost=True),
+                state=tk.HIDDEN, tags="shadow"
+            )
+            for _ in range(4)
+        ]
+        self.piece_items = [
+            self.canvas.create_image(0, 0, anchor=tk.NW, state=tk.HIDDEN, tags="piece")
+            for _ in range(4)
+        ]
+        # Последние нарисованные копия тени и фигуры и видимость их клеток:
+        # пока фигура стоит на месте, кадр ничего не выделяет.
+        self.shown_shadow = Piece(kind=-1)
+        self.shown_piece = Piece(kind=-1)
+        self.shadow_visible = bytearray(4)
+        self.piece_visible = bytearray(4)
+        self.piece_color = None
+
+    def group_tag(self, group):
+        return f"board-row{group}"
+
+    def tile_origin(self, x, y):
+        return (
+            self.padding_x + x * self.tile_size,
+            self.padding_y + y * self.tile_size
+        )
+
+    def place_grid(self):
+        # Координаты колонок и строк считаются один раз на размер клетки:
+        # при движении фигуры готовые int берутся из списков, а не создаются.
+        self.column_x = [self.padding_x + x * self.tile_size for x in range(self.width)]
+        self.row_y = [self.padding_y + y * self.tile_size for y in range(self.height)]
+
+    def subscribe(self, events):
+        events.subscribe(PIECE_LOCKED, lambda piece, rows: self.dirty_rows.update(rows))
+        events.subscribe(ROWS_CLEARED, self.rows_cleared)
+
+    def render(self, engine, shadow_piece):
+        self.dirty_rows.update(range(self.height))
+        self.update(engine, shadow_piece)
+
+    def update(self, engine, shadow_piece):
+        # Обход пустого множества тоже создаёт итератор, поэтому без
+        # отложенных строк кадр до него не доходит.
+        if self.dirty_rows:
+            for y in self.dirty_rows:
+                self.paint_row(engine, y)
+            self.dirty_rows.clear()
+        
+        piece = engine.current_piece
+        self.move_items(self.shadow_items, self.shadow_visible, self.shown_shadow, shadow_piece)
+        
+        if piece.color != self.piece_color:
+            sprite = sprite_atlas.get(piece.color, self.tile_size)
+            for item in self.piece_items:
+                self.canvas.itemconfig(item, image=sprite)
+            self.piece_color = piece.color
+        self.move_items(self.piece_items, self.piece_visible, self.shown_piece, piece)
+
+    def paint_row(self, engine, y):
+        width = self.width
+        row = engine.colors[y * width:(y + 1) * width]
+        group = self.row_groups[y]
+        shown = self.group_colors[group]
+        if row == shown:
+            return
+        items = self.groups[group]
+        for x in range(width):
+            value = row[x]
+            if value != shown[x]:
+                if value:
+                    self.canvas.itemconfig(
+                        items[x],
+                        image=sprite_atlas.get(value, self.tile_size),
+                        state=tk.NORMAL
+                    )
+                else:
+                    self.canvas.itemconfig(items[x], state=tk.HIDDEN)
+        shown[:] = row
+
+    def rows_cleared(self, cleared):
+        # Убранные группы прячутся и уходят наверх, остальные опускаются на
+        # число убранных строк под ними. Отложенные строки сдвигаются так же.
+        cleared_set = set(cleared)
+        groups = self.row_groups
+        kept = [y for y in range(self.height) if y not in cleared_set]
+        order = [groups[y] for y in cleared] + [groups[y] for y in kept]
+        moved_from = cleared + kept
+        for new_y, (group, old_y) in enumerate(zip(order, moved_from)):
+            if new_y != old_y:
+                self.canvas.move(self.group_tag(group), 0, (new_y - old_y) * self.tile_size)
+        for group in order[:len(cleared)]:
+            self.canvas.itemconfig(self.group_tag(group), state=tk.HIDDEN)
+            self.group_colors[group][:] = bytes(self.width)
+        self.row_groups = order
+        
+        shift = {old_y: new_y for new_y, old_y in enumerate(moved_from)}
+        self.dirty_rows = {shift[y] for y in self.dirty_rows if y not in cleared_set}
+
+    def move_items(self, items, visible, shown, piece):
+        if piece.same(shown):
+            return
+        shown.assign(piece)
+        cells = piece_state(piece).cells
+        i = 0
+        while i < len(items):
+            item = items[i]
+            x, y = cells[i]
+            y += piece.y
+            if y >= 0:
+                self.canvas.coords(item, self.column_x[piece.x + x], self.row_y[y])
+                if not visible[i]:
+                    self.canvas.itemconfig(item, state=tk.NORMAL)
+                    visible[i] = 1
+            elif visible[i]:
+                self.canvas.itemconfig(item, state=tk.HIDDEN)
+                visible[i] = 0
+            i += 1
+
+    def resize(self, tile_size, padding_x, padding_y):
+        self.tile_size = tile_size
+        self.padding_x = padding_x
+        self.padding_y = padding_y
+        self.place_grid()
+        
+        for y, group in enumerate(self.row_groups):
+            colors = self.group_colors[group]
+            for x, item in enumerate(self.groups[group]):
+                self.canvas.coords(item, *self.tile_origin(x, y))
+                if colors[x]:
+                    self.canvas.itemconfig(item, image=sprite_atlas.get(colors[x], tile_size))
+        
+        ghost = sprite_atlas.get(0, tile_size, ghost=True)
+        for item in self.shadow_items:
+            self.canvas.itemconfig(item, image=ghost)
+        for item in self.shadow_items + self.piece_items:
+            self.canvas.itemconfig(item, state=tk.HIDDEN)
+        self.piece_color = None
+        self.shown_shadow.kind = self.shown_piece.kind = -1
+        self.shadow_visible[:] = self.piece_visible[:] = bytes(4)
+
+class RasterRenderer:
+    # Всё поле рисуется в один PhotoImage, который показан единственным
+    # элементом холста. Перерисовываются только изменившиеся клетки.
+    EMPTY = 0
+    SHADOW = len(COLORS) + 1
+    
+    def __init__(self, canvas, padding_x, padding_y, tile_size=TILE_SIZE, width=WIDTH, height=HEIGHT):
+        self.canvas = canvas
+        self.tile_size = tile_size
+        self.width = width
+        self.height = height
+        
+        self.palette = {self.EMPTY: "#101010", self.SHADOW: "#808080"}
+        for index, color in enumerate(COLORS, start=1):
+            r, g, b = (value // 256 for value in canvas.winfo_rgb(color))
+            self.palette[index] = f"#{r:02x}{g:02x}{b:02x}"
+        
+        self.image_item = canvas.create_image(padding_x, padding_y, anchor=tk.NW, tags="blocks")
+        self.resize(tile_size, padding_x, padding_y)
+
+    def resize(self, tile_size, padding_x, padding_y):
+        self.tile_size = tile_size
+        width = self.width * tile_size
+        height = self.height * tile_size
+        self.framebuffer = tk.PhotoImage(width=width, height=height)
+        self.framebuffer.put(self.palette[self.EMPTY], to=(0, 0, width, height))
+        self.canvas.coords(self.image_item, padding_x, padding_y)
+        self.canvas.itemconfig(self.image_item, image=self.framebuffer)
+        self.scratch = tk.PhotoImage()
+        self.shown = bytearray(self.width * self.height)
+        self.frame = bytearray(self.width * self.height)
+
+    def subscribe(self, events):
+        events.subscribe(ROWS_CLEARED, self.rows_cleared)
+
+    def update(self, engine, shadow_piece):
+        self.render(engine, shadow_piece)
+
+    def rows_cleared(self, cleared):
+        # Уцелевшие полосы кадра копируются вниз целиком через промежуточный
+        # PhotoImage, а не перерисовываются по клеткам. Идём снизу вверх:
+        # полоса затирает только уже убранные или уже сдвинутые строки.
+        width = self.width
+        size = self.tile_size
+        cleared_set = set(cleared)
+        shown = self.shown
+        frame = bytearray(len(shown))
+        below = 0
+        y = self.height - 1
+        while y >= 0:
+            if y in cleared_set:
+                below += 1
+                y -= 1
+                continue
+            end = y
+            while y >= 0 and y not in cleared_set:
+                y -= 1
+            start = y + 1
+            if below:
+                self.scratch.tk.call(self.scratch, 'copy', self.framebuffer,
+                                     '-from', 0, start * size, width * size, (end + 1) * size, '-shrink')
+                self.framebuffer.tk.call(self.framebuffer, 'copy', self.scratch, '-to', 0, (start + below) * size)
+            frame[(start + below) * width:(end + 1 + below) * width] = shown[start * width:(end + 1) * width]
+        self.framebuffer.put(self.palette[self.EMPTY], to=(0, 0, width * size, len(cleared) * size))
+        self.shown = frame
+
+    def render(self, engine, shadow_piece):
+        # Кадр собирается в постоянный буфер и после отрисовки меняется
+        # местами с показанным, так что новых bytearray на кадр нет.
+        width = self.width
+        frame = self.frame
+        frame[:] = engine.colors
+        self.stamp(frame, shadow_piece, self.SHADOW, False)
+        piece = engine.current_piece
+        self.stamp(frame, piece, piece.color, True)
+        
+        shown = self.shown
+        if frame == shown:
+            return
+        index = 0
+        while index < len(frame):
+            if frame[index] != shown[index]:
+                self.paint(index % width, index // width, frame[index])
+            index += 1
+        self.frame = shown
+        self.shown = frame
+
+    def stamp(self, frame, piece, value, cover):
+        width = self.width
+        cells = piece_state(piece).cells
+        i = 0
+        while i < len(cells):
+            x, y = cells[i]
+            y += piece.y
+            if y >= 0:
+                index = y * width + piece.x + x
+                if cover or not frame[index]:
+                    frame[index] = value
+            i += 1
+
+    def paint(self, x, y, value):
+        size = self.tile_size
+        left = x * size
+        top = y * size
+        if value == self.EMPTY or size < 4:
+            self.framebuffer.put(self.palette[value], to=(left, top, left + size, top + size))
+            return
+        outline = "#ffffff" if value != self.SHADOW else self.palette[value]
+        self.framebuffer.put(outline, to=(left, top, left + size, top + size))
+        self.framebuffer.put(self.palette[value], to=(left + 1, top + 1, left + size - 1, top + size - 1))
+
+RENDERERS = {
+    'canvas': BoardRenderer,
+    'raster': RasterRenderer
+}
+
+class GameLoop:
+    # Симуляция идёт фиксированными шагами по time.monotonic(): пропущенные
+    # шаги догоняются без отрисовки, а кадр рисуется не чаще раза за вызов.
+    def __init__(self, root, step, render, tick_rate=TICK_RATE, max_catch_up=TICK_RATE // 4, profiler=None):
+        self.root = root
+        self.step = step
+        self.render = render
+        self.profiler = profiler
+        self.step_time = 1 / tick_rate
+        self.max_catch_up = max_catch_up
+        self.running = False
+        self.after_id = None
+        self.last_time = 0.0
+        self.accumulator = 0.0
+        self.ticks = 0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.last_time = time.monotonic()
+        self.accumulator = 0.0
+        self.after_id = self.root.after(int(self.step_time * 1000), self.frame)
+
     def stop(self):
-        self.player.pause()
-        self.player.seek(0)
-        self.playing = False
+        self.running = False
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def frame(self):
+        self.after_id = None
+        if not self.running:
+            return
+        
+        now = time.monotonic()
+        if self.profiler is not None:
+            self.profiler.record('interval', now - self.last_time)
+        self.accumulator += now - self.last_time
+        self.last_time = now
+        
+        steps = 0
+        while self.running and self.accumulator >= self.step_time:
+            self.step()
+            self.ticks += 1
+            self.accumulator -= self.step_time
+            steps += 1
+            if steps >= self.max_catch_up:
+                self.accumulator = 0.0
+                break
         
-    def set_loop(self, loop):
-        self.loop = loop
+        self.render()
+        
+        if self.profiler is not None:
+            self.profiler.record('frame', time.monotonic() - now)
+        
+        if self.running:
+            delay = (self.step_time - self.accumulator) * 1000
+            self.after_id = self.root.after(max(1, int(delay)), self.frame)
 
-class Tetris:
-    def __init__(self, root, music_enabled, sound_enabled, return_to_menu_callback):
+class SceneManager:
+    # Меню, игра и настройки живут в одном окне Tk: каждая сцена строит свой
+    # Frame один раз, а переключение только прячет одну и показывает другую.
+    def __init__(self, root):
         self.root = root
-        self.root.title("Tetris")
         self.root.geometry("400x750")
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.scenes = {}
+        self.factories = {}
+        self.current = None
+
+    def add(self, name, scene):
+        self.scenes[name] = scene
+
+    def add_lazy(self, name, factory):
+        # Сцена строится при первом показе, а не на старте.
+        self.factories[name] = factory
+
+    def get(self, name):
+        if name not in self.scenes:
+            self.scenes[name] = self.factories.pop(name)(self)
+        return self.scenes[name]
+
+    def show(self, name, *args, **kwargs):
+        if self.current is not None:
+            self.scenes[self.current].hide()
+        self.current = name
+        scene = self.get(name)
+        self.root.title(scene.title)
+        scene.show(*args, **kwargs)
+
+    def close(self):
+        for scene in self.scenes.values():
+            scene.close()
+        self.root.destroy()
+
+class OptionsScene:
+    def __init__(self, manager):
+        self.manager = manager
+        self.root = manager.root
+        self.title = "Options"
+        self.origin = None
+        
+        self.load_images()
+        self.setup_ui()
+
+    def load_images(self):
+        try:
+            self.options_bg_photo = image_cache.get("images/options_background.jpg", (400, 750))
+        except FileNotFoundError:
+            self.options_bg_photo = ImageTk.PhotoImage(Image.new('RGB', (400, 750), 'black'))
+        
+        try:
+            self.exit_photo = image_cache.get("images/exit.png", (100, 25))
+        except FileNotFoundError:
+            self.exit_photo = None
+        
+        try:
+            self.music_on_image = image_cache.get("images/music_button_on.jpg", (300, 75), 'lanczos')
+            self.music_off_image = image_cache.get("images/music_button_off.jpg", (300, 75), 'lanczos')
+            self.volume_on_image = image_cache.get("images/volume_button_on.jpg", (300, 75), 'lanczos')
+            self.volume_off_image = image_cache.get("images/volume_button_off.jpg", (300, 75), 'lanczos')
+        except FileNotFoundError as e:
+            print(f"Ошибка загрузки изображений: {e}")
+            self.music_on_image = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'green'))
+            self.music_off_image = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'red'))
+            self.volume_on_image = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'blue'))
+            self.volume_off_image = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'gray'))
+        
+        try:
+            self.replay_photo = image_cache.get("images/replay_button.png", (300, 75), 'lanczos')
+        except FileNotFoundError:
+            print("Replay button image not found, using text button")
+            self.replay_photo = None
+
+    def setup_ui(self):
+        self.frame = tk.Frame(self.root)
+        
+        self.canvas = tk.Canvas(self.frame, width=400, height=750, highlightthickness=0)
+        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.options_bg_photo)
+        self.canvas.pack()
+        
+        self.exit_button = tk.Button(
+            self.frame,
+            image=self.exit_photo if self.exit_photo else None,
+            text="Exit" if not self.exit_photo else "",
+            font=("Arial", 12),
+            command=self.back,
+            bg="red" if not self.exit_photo else "black",
+            fg="white",
+            borderwidth=0
+        )
+        self.exit_button.place(x=10, y=13)
+        
+        button_style = {
+            'borderwidth': 0,
+            'highlightthickness': 0,
+            'width': 300,
+            'height': 75,
+            'bg': 'black',
+            'activebackground': '#333333',
+            'compound': 'center',
+            'relief': 'flat'
+        }
+        
+        self.music_button = tk.Button(self.frame, image=self.music_on_image, command=self.toggle_music, **button_style)
+        self.sound_button = tk.Button(self.frame, image=self.volume_on_image, command=self.toggle_sound, **button_style)
+        self.replay_button = tk.Button(
+            self.frame,
+            image=self.replay_photo if self.replay_photo else None,
+            text="Replay" if not self.replay_photo else "",
+            font=("Arial", 14, "bold") if not self.replay_photo else None,
+            fg='white' if not self.replay_photo else None,
+            command=self.replay,
+            **button_style
+        )
+
+    def show(self, origin, replay=False):
+        self.origin = origin
+        self.update_buttons()
+        
+        button_width = 300
+        button_height = 75
+        x_position = (400 - button_width) // 2
+        if replay:
+            button_spacing = 25
+            start_y = (750 - (3 * button_height + 2 * button_spacing)) // 2
+            self.replay_button.place(x=x_position, y=start_y + 2 * (button_height + button_spacing),
+                                     width=button_width, height=button_height)
+        else:
+            button_spacing = 30
+            start_y = (750 - (2 * button_height + button_spacing)) // 2 + 50
+            self.replay_button.place_forget()
+        self.music_button.place(x=x_position, y=start_y, width=button_width, height=button_height)
+        self.sound_button.place(x=x_position, y=start_y + button_height + button_spacing,
+                                width=button_width, height=button_height)
+        
+        self.frame.pack(fill=tk.BOTH, expand=True)
+
+    def hide(self):
+        self.frame.pack_forget()
+
+    def close(self):
+        self.origin = None
+
+    def update_buttons(self):
+        self.music_button.config(image=self.music_on_image if self.origin.music_enabled else self.music_off_image)
+        self.sound_button.config(image=self.volume_on_image if self.origin.sound_enabled else self.volume_off_image)
+
+    def toggle_music(self):
+        self.origin.toggle_music()
+        self.update_buttons()
+
+    def toggle_sound(self):
+        self.origin.toggle_sound()
+        self.update_buttons()
+
+    def replay(self):
+        self.origin.restart_game_from_options()
+
+    def back(self):
+        self.origin.close_options()
+
+class Tetris:
+    def __init__(self, manager, music_enabled, sound_enabled, return_to_menu_callback,
+                 width=WIDTH, height=HEIGHT, renderer='canvas'):
+        self.manager = manager
+        self.root = manager.root
+        self.title = "Tetris"
+        self.active = False
+        
+        from profiler import FrameProfiler, LatencyTracer
+        from replay import ReplayRecorder
         
-        self.board = [[0] * WIDTH for _ in range(HEIGHT)]
-        self.current_piece = self.new_piece()
-        self.game_over = False
-        self.score = 0
+        self.recorder = ReplayRecorder()
+        self.game = Game(width=width, height=height, recorder=self.recorder)
+        self.engine = self.game.engine
+        
+        self.profiler = FrameProfiler()
+        self.engine.merge_piece = self.profiler.wrap('merge_piece', self.engine.merge_piece)
+        self.engine.clear_lines = self.profiler.wrap('clear_lines', self.engine.clear_lines)
+        self.latency = LatencyTracer()
+        self.session_recorded = False
+        self.overlay_visible = False
+        self.overlay_updated = 0.0
+        self.renderer_name = renderer
         self.music_enabled = music_enabled
         self.sound_enabled = sound_enabled
         self.return_to_menu_callback = return_to_menu_callback
         self.paused = False
+        self.autopilot = None
         
-        self.music_player = MusicPlayer()
-        self.music_player.load("sounds/music.wav")
-        self.music_player.set_loop(True)
-        if self.music_enabled:
-            self.music_player.play()
+        load_score_store()
         
-        self.keys_pressed = set()
-        self.fast_fall = False
+        self.music_player = load_audio().track("sounds/music.wav")
         
         self.load_images()
         
@@ -102,32 +772,25 @@ class Tetris:
         
         self.root.bind("<KeyPress>", self.on_key_press)
         self.root.bind("<KeyRelease>", self.on_key_release)
+        self.root.bind("<FocusOut>", lambda event: self.game.reset_input())
         
-        self.update()
+        self.loop = GameLoop(self.root, self.tick, self.render_frame, profiler=self.profiler)
         
-        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        events = self.engine.events
+        self.renderer.subscribe(events)
+        events.subscribe(PIECE_LOCKED, self.piece_locked)
+        events.subscribe(SCORE_CHANGED, self.score_changed)
+        events.subscribe(GAME_OVER, self.game_over)
 
     def load_images(self):
         try:
-            game_bg_image = Image.open("images/game_background.jpg")
-            self.game_bg_photo = ImageTk.PhotoImage(game_bg_image.resize((400, 750)))
-            
-            game_pole_image = Image.open("images/gamepole.jpg")
-            self.game_pole_photo = ImageTk.PhotoImage(game_pole_image.resize((314, 614)))
-            
-            exit_img = Image.open("images/exit.png")
-            self.exit_photo = ImageTk.PhotoImage(exit_img.resize((100, 25)))
+            self.game_bg_photo = image_cache.get("images/game_background.jpg", (400, 750))
             
-            options_img = Image.open("images/optionsgame.png")
-            self.options_photo = ImageTk.PhotoImage(options_img.resize((100, 28)))
+            self.game_pole_photo = image_cache.get("images/gamepole.jpg", (314, 614))
             
-            self.music_on_image = ImageTk.PhotoImage(Image.open("images/music_button_on.jpg").resize((300, 75), Image.LANCZOS))
-            self.music_off_image = ImageTk.PhotoImage(Image.open("images/music_button_off.jpg").resize((300, 75), Image.LANCZOS))
-            self.volume_on_image = ImageTk.PhotoImage(Image.open("images/volume_button_on.jpg").resize((300, 75), Image.LANCZOS))
-            self.volume_off_image = ImageTk.PhotoImage(Image.open("images/volume_button_off.jpg").resize((300, 75), Image.LANCZOS))
+            self.exit_photo = image_cache.get("images/exit.png", (100, 25))
             
-            replay_img = Image.open("images/replay_button.png")
-            self.replay_photo = ImageTk.PhotoImage(replay_img.resize((300, 75), Image.LANCZOS))
+            self.options_photo = image_cache.get("images/optionsgame.png", (100, 28))
             
         except FileNotFoundError as e:
             print(f"Ошибка загрузки изображения: {e}")
@@ -135,31 +798,26 @@ class Tetris:
             self.game_pole_photo = ImageTk.PhotoImage(Image.new('RGBA', (314, 614), (0, 0, 0, 0)))
             self.exit_photo = None
             self.options_photo = None
-            self.music_on_image = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'green'))
-            self.music_off_image = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'red'))
-            self.volume_on_image = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'blue'))
-            self.volume_off_image = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'gray'))
-            self.replay_photo = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'purple'))
 
     def setup_ui(self):
         self.main_frame = tk.Frame(self.root)
-        self.main_frame.pack()
         
-        self.canvas = tk.Canvas(self.main_frame, width=400, height=750, bg='black')
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.game_bg_photo)
+        self.canvas = tk.Canvas(self.main_frame, width=400, height=750, bg='black', highlightthickness=0)
+        self.bg_item = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.game_bg_photo)
         
         self.game_pole_offset_x = 50
         self.game_pole_offset_y = 43
-        self.canvas.create_image(
+        self.pole_item = self.canvas.create_image(
             self.game_pole_offset_x,
             self.game_pole_offset_y,
             anchor=tk.NW,
             image=self.game_pole_photo
         )
-        self.canvas.pack()
+        self.canvas.pack(fill=tk.BOTH, expand=True)
         
-        self.padding_x = self.game_pole_offset_x + 7
-        self.padding_y = self.game_pole_offset_y + 7
+        self.scale = 1.0
+        self.resize_job = None
+        self.layout_board(self.scale)
         
         self.exit_button = tk.Button(
             self.main_frame,
@@ -181,6 +839,28 @@ class Tetris:
         )
         self.options_button.place(x=284, y=12)
         
+        self.restart_button = tk.Button(
+            self.main_frame,
+            text="REPLAY",
+            font=("Arial", 24, "bold"),
+            width=10,
+            height=2,
+            bg="#4CAF50",
+            fg="black",
+            command=self.restart_game
+        )
+        
+        self.menu_button = tk.Button(
+            self.main_frame,
+            text="EXIT",
+            font=("Arial", 24, "bold"),
+            width=10,
+            height=2,
+            bg="#f44336",
+            fg="black",
+            command=self.return_to_menu
+        )
+        
         self.score_text = self.canvas.create_text(
             210, 722,
             text="0",
@@ -191,619 +871,533 @@ class Tetris:
             tags=("score", "score_text")
         )
         
+        self.shown_score = 0
+        
+        self.renderer = RENDERERS[self.renderer_name](
+            self.canvas, self.padding_x, self.padding_y,
+            self.tile_size, self.engine.width, self.engine.height
+        )
+        self.overlay_text = self.canvas.create_text(
+            10, 45,
+            text="",
+            font=("Courier", 10),
+            fill="#00FF00",
+            anchor=tk.NW,
+            state=tk.HIDDEN,
+            tags="overlay"
+        )
+        
         self.canvas.tag_raise("score")
+        self.canvas.bind("<Configure>", self.on_canvas_configure)
 
-    def new_piece(self):
-        shape = random.choice(SHAPES)
-        color = random.choice(COLORS)
-        return {
-            'shape': shape,
-            'color': color,
-            'x': WIDTH // 2 - len(shape[0]) // 2,
-            'y': -1
-        }
+    def layout_board(self, scale):
+        width = self.engine.width
+        height = self.engine.height
+        field_width = int(FIELD_WIDTH * scale)
+        field_height = int(FIELD_HEIGHT * scale)
+        self.tile_size = max(1, min(int(TILE_SIZE * scale), field_width // width, field_height // height))
+        self.padding_x = int((self.game_pole_offset_x + 7) * scale) + (field_width - width * self.tile_size) // 2
+        self.padding_y = int((self.game_pole_offset_y + 7) * scale) + (field_height - height * self.tile_size) // 2
 
-    def draw_piece(self, piece, shadow=False):
-        for y, row in enumerate(piece['shape']):
-            for x, cell in enumerate(row):
-                if cell:
-                    if piece['y'] + y < 0:
-                        continue
-                        
-                    fill_color = piece['color'] if not shadow else "gray"
-                    outline_color = "white" if not shadow else "gray"
-                    self.canvas.create_rectangle(
-                        self.padding_x + (piece['x'] + x) * TILE_SIZE,
-                        self.padding_y + (piece['y'] + y) * TILE_SIZE,
-                        self.padding_x + (piece['x'] + x + 1) * TILE_SIZE,
-                        self.padding_y + (piece['y'] + y + 1) * TILE_SIZE,
-                        fill=fill_color, outline=outline_color, 
-                        stipple="gray50" if shadow else None
-                    )
+    def on_canvas_configure(self, event):
+        # Снизу масштаб ограничен: при почти свёрнутом окне размеры картинок
+        # обнулились бы, и PIL не смог бы их масштабировать.
+        scale = max(MIN_SCALE, min(event.width / 400, event.height / 750))
+        # Отложенный rescale отменяется и тогда, когда окно вернулось к
+        # текущему масштабу, иначе он применил бы промежуточный размер.
+        if self.resize_job is not None:
+            self.root.after_cancel(self.resize_job)
+            self.resize_job = None
+        if abs(scale - self.scale) < 0.02:
+            return
+        self.resize_job = self.root.after(100, lambda: self.rescale(scale))
 
-    def draw_board(self):
-        self.canvas.delete("all")
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.game_bg_photo)
-        self.canvas.create_image(
-            self.game_pole_offset_x,
-            self.game_pole_offset_y,
-            anchor=tk.NW, 
-            image=self.game_pole_photo,
-            tags="game"
-        )
-        
-        for y in range(HEIGHT):
-            for x in range(WIDTH):
-                if self.board[y][x]:
-                    self.canvas.create_rectangle(
-                        self.padding_x + x * TILE_SIZE,
-                        self.padding_y + y * TILE_SIZE,
-                        self.padding_x + (x + 1) * TILE_SIZE,
-                        self.padding_y + (y + 1) * TILE_SIZE,
-                        fill=COLORS[self.board[y][x] - 1], 
-                        outline='white',
-                        tags="blocks"
-                    )
+    def rescale(self, scale):
+        self.resize_job = None
+        self.scale = scale
+        self.layout_board(scale)
         
-        shadow_piece = self.calculate_shadow()
-        self.draw_piece(shadow_piece, shadow=True)
-        
-        self.draw_piece(self.current_piece)
-        
-        self.update_score()
-        
-        for y in range(HEIGHT):
-            for x in range(WIDTH):
-                if self.board[y][x]:
-                    self.canvas.create_rectangle(
-                        self.padding_x + x * TILE_SIZE,
-                        self.padding_y + y * TILE_SIZE,
-                        self.padding_x + (x + 1) * TILE_SIZE,
-                        self.padding_y + (y + 1) * TILE_SIZE,
-                        fill=COLORS[self.board[y][x] - 1], outline='white'
-                    )
-        
-        shadow_piece = self.calculate_shadow()
-        self.draw_piece(shadow_piece, shadow=True)
-        
-        self.draw_piece(self.current_piece)
+        try:
+            self.game_bg_photo = image_cache.get("images/game_background.jpg", (int(400 * scale), int(750 * scale)))
+            self.game_pole_photo = image_cache.get("images/gamepole.jpg", (int(314 * scale), int(614 * scale)))
+            self.canvas.itemconfig(self.bg_item, image=self.game_bg_photo)
+            self.canvas.itemconfig(self.pole_item, image=self.game_pole_photo)
+        except FileNotFoundError:
+            pass
+        self.canvas.coords(self.pole_item, self.game_pole_offset_x * scale, self.game_pole_offset_y * scale)
+        self.canvas.coords(self.score_text, 210 * scale, 722 * scale)
         
+        self.renderer.resize(self.tile_size, self.padding_x, self.padding_y)
+        sprite_atlas.retain(self.tile_size)
+        self.draw_board()
+
+    def draw_board(self, full=False):
+        # Строки поля перерисовываются по событиям движка; полная сверка
+        # нужна только после сброса игры.
+        start = time.perf_counter()
+        if full:
+            self.renderer.render(self.engine, self.engine.calculate_shadow())
+        else:
+            self.renderer.update(self.engine, self.engine.calculate_shadow())
         self.update_score()
+        self.profiler.record('draw_board', time.perf_counter() - start)
 
-    def calculate_shadow(self):
-        shadow_piece = {
-            'shape': self.current_piece['shape'],
-            'color': self.current_piece['color'],
-            'x': self.current_piece['x'],
-            'y': self.current_piece['y']
-        }
-        while not self.check_collision(shadow_piece, dy=1):
-            shadow_piece['y'] += 1
-        return shadow_piece
-
-    def check_collision(self, piece, dx=0, dy=0):
-        for y, row in enumerate(piece['shape']):
-            for x, cell in enumerate(row):
-                if cell:
-                    new_x = piece['x'] + x + dx
-                    new_y = piece['y'] + y + dy
-                    if (new_x < 0 or 
-                        new_x >= WIDTH or 
-                        new_y >= HEIGHT or 
-                        (new_y >= 0 and self.board[new_y][new_x])):
-                        return True
-        return False
-
-    def merge_piece(self):
-        for y, row in enumerate(self.current_piece['shape']):
-            for x, cell in enumerate(row):
-                if cell:
-                    board_y = self.current_piece['y'] + y
-                    if 0 <= board_y < HEIGHT:
-                        self.board[board_y][self.current_piece['x'] + x] = COLORS.index(self.current_piece['color']) + 1
-        
+    def play_effect(self, file_path):
+        start = time.perf_counter()
+        play_sound(file_path)
+        self.profiler.record('audio', time.perf_counter() - start)
+
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        self.canvas.itemconfig(self.overlay_text, state=tk.NORMAL if self.overlay_visible else tk.HIDDEN)
+        self.overlay_updated = 0.0
+        self.update_overlay()
+
+    def update_overlay(self):
+        now = time.monotonic()
+        if not self.overlay_visible or now - self.overlay_updated < 0.5:
+            return
+        self.overlay_updated = now
+        interval = self.profiler.summary('interval')
+        frame = self.profiler.summary('frame')
+        fps = 1000 / interval['mean'] if interval.get('mean') else 0.0
+        images = image_cache.stats()
+        self.canvas.itemconfig(
+            self.overlay_text,
+            text=(
+                f"FPS {fps:5.1f}\n"
+                f"frame {frame.get('p50', 0.0):.2f} ms p95 {frame.get('p95', 0.0):.2f} max {frame.get('max', 0.0):.2f}\n"
+                f"draw {self.profiler.last('draw_board'):.2f} ms\n"
+                f"items {len(self.canvas.find_all())}\n"
+                f"images {images['size']} hit {images['hits']} miss {images['misses']}"
+            )
+        )
+        self.canvas.tag_raise("overlay")
+
+    def piece_locked(self, piece, rows):
         if self.sound_enabled:
-            play_sound("sounds/sound.wav")
-            
-        self.clear_lines()
-        self.current_piece = self.new_piece()
-        
-        if self.check_collision(self.current_piece, dy=0):
-            self.game_over = True
-            self.music_player.stop()
-            self.show_game_over()
-
-    def clear_lines(self):
-        lines_to_clear = [i for i, row in enumerate(self.board) if all(row)]
-        for i in lines_to_clear:
-            del self.board[i]
-            self.board.insert(0, [0] * WIDTH)
-        self.score += len(lines_to_clear) * 100
+            self.play_effect("sounds/sound.wav")
+
+    def score_changed(self, score, lines):
         self.update_score()
 
+    def game_over(self):
+        self.loop.stop()
+        self.music_player.stop()
+        self.end_session()
+        self.show_game_over()
+
+    def end_session(self):
+        self.save_replay()
+        if not self.session_recorded and self.engine.pieces:
+            load_score_store().record_game(
+                self.engine.score,
+                self.engine.lines,
+                self.engine.pieces,
+                self.game.ticks / TICK_RATE
+            )
+        self.session_recorded = True
+
+    def save_replay(self):
+        if self.recorder.saved or not self.game.ticks:
+            return
+        # Байты собираются сразу, до перезапуска партии, а на диск их
+        # пишет фоновый поток.
+        data = self.recorder.to_bytes(self.game.ticks)
+        self.recorder.saved = True
+        file_path = os.path.join(REPLAY_DIR, time.strftime("%Y%m%d-%H%M%S") + f"-{self.game.seed}.trp")
+        load_writer().submit(lambda: write_replay(file_path, data))
+
     def update_score(self):
-        self.canvas.delete("score_text")
-        
-        self.score_text = self.canvas.create_text(
-            210, 722,
-            text=f"{self.score}",
-            font=("Arial", 36, "bold"),
-            fill="#FFFFFF",
-            width=400,
-            anchor="center",
-            tags=("score", "score_text")
-        )
-        
-        self.canvas.tag_raise("score")
+        if self.engine.score != self.shown_score:
+            self.canvas.itemconfig(self.score_text, text=f"{self.engine.score}")
+            self.shown_score = self.engine.score
 
     def on_key_press(self, event):
-        if self.game_over or self.paused:
+        if not self.active:
             return
-            
-        if event.keysym == 'Left':
-            if not self.check_collision(self.current_piece, dx=-1):
-                self.current_piece['x'] -= 1
-                self.draw_board()
-        elif event.keysym == 'Right':
-            if not self.check_collision(self.current_piece, dx=1):
-                self.current_piece['x'] += 1
-                self.draw_board()
-        elif event.keysym == 'Down':
-            self.fast_fall = True
-            if not self.check_collision(self.current_piece, dy=1):
-                self.current_piece['y'] += 1
-                self.draw_board()
-        elif event.keysym == 'Up':
-            self.rotate_piece()
-            self.draw_board()
+        if event.keysym == 'F3':
+            self.toggle_overlay()
+            return
+        if event.keysym == 'F4':
+            print(f"Профиль кадров сохранён: {self.profiler.dump(PROFILE_DIR)}")
+            return
+        if event.keysym == 'F5':
+            file_path = self.profiler.toggle_cprofile(PROFILE_DIR)
+            print(f"cProfile сохранён: {file_path}" if file_path else "cProfile запущен")
+            return
+        if event.keysym == 'F6':
+            self.export_latency()
+            return
+        if event.keysym == 'F7':
+            self.toggle_autoplay()
+            return
+        if self.paused:
+            return
+        self.game.key_press(event.keysym, time.monotonic())
     
     def on_key_release(self, event):
-        if event.keysym == 'Down':
-            self.fast_fall = False
-
-    def rotate_piece(self):
-        piece = self.current_piece
-        shape = piece['shape']
-        new_shape = [list(row) for row in zip(*shape[::-1])]
-        if not self.check_collision({'shape': new_shape, 'x': piece['x'], 'y': piece['y']}):
-            piece['shape'] = new_shape
+        if self.active:
+            self.game.key_release(event.keysym)
 
     def show_game_over(self):
         if self.sound_enabled:
-            play_sound("sounds/gameoversound.wav")
+            self.play_effect("sounds/gameoversound.wav")
 
-        self.restart_button = tk.Button(
-            self.main_frame,
-            text="REPLAY",
-            font=("Arial", 24, "bold"),
-            width=10,
-            height=2,
-            bg="#4CAF50",
-            fg="black",
-            command=self.restart_game
-        )
         button_width = 200
         button_height = 50
         x_position = (400 - button_width) // 2
         self.restart_button.place(x=x_position, y=250, width=button_width, height=button_height)
-
-        self.menu_button = tk.Button(
-            self.main_frame,
-            text="EXIT",
-            font=("Arial", 24, "bold"),
-            width=10,
-            height=2,
-            bg="#f44336",
-            fg="black",
-            command=self.return_to_menu
-        )
         self.menu_button.place(x=x_position, y=320, width=button_width, height=button_height)
 
-    def show_options(self):
-        self.paused = True
-        self.music_player.pause()
-        self.options_window = tk.Toplevel(self.root)
-        self.options_window.title("Options")
-        self.options_window.geometry("400x750")
-
-        try:
-            options_bg_image = Image.open("images/options_background.jpg")
-            options_bg_image = options_bg_image.resize((400, 750))
-            self.options_bg_photo = ImageTk.PhotoImage(options_bg_image)
-        except FileNotFoundError:
-            self.options_bg_photo = ImageTk.PhotoImage(Image.new('RGB', (400, 750), 'black'))
-
-        self.options_canvas = tk.Canvas(self.options_window, width=400, height=750)
-        self.options_canvas.create_image(0, 0, anchor=tk.NW, image=self.options_bg_photo)
-        self.options_canvas.pack()
-
-        try:
-            exit_img = Image.open("images/exit.png")
-            exit_img = exit_img.resize((100, 25))
-            self.exit_photo_options = ImageTk.PhotoImage(exit_img)
-        except FileNotFoundError:
-            self.exit_photo_options = None
-            
-        self.exit_button = tk.Button(
-            self.options_window,
-            image=self.exit_photo_options if self.exit_photo_options else None,
-            text="Exit" if not self.exit_photo_options else "",
-            font=("Arial", 12),
-            command=lambda: self.close_options(self.options_window),
-            bg="red" if not self.exit_photo_options else "black",
-            fg="white",
-            borderwidth=0
-        )
-        self.exit_button.place(x=10, y=13)
-        
-        button_width = 300
-        button_height = 75
-        button_spacing = 25
-        total_buttons_height = 3 * button_height + 2 * button_spacing
-        x_position = (400 - button_width) // 2
-        start_y = (750 - total_buttons_height) // 2
-        
-        button_style = {
-            'borderwidth': 0,
-            'highlightthickness': 0,
-            'width': button_width,
-            'height': button_height,
-            'bg': 'black',
-            'activebackground': '#333333',
-            'compound': 'center',
-            'relief': 'flat'
-        }
+    def show(self):
+        self.main_frame.pack(fill=tk.BOTH, expand=True)
+        self.active = True
 
-        self.music_button = tk.Button(
-            self.options_window,
-            image=self.music_on_image if self.music_enabled else self.music_off_image,
-            command=lambda: self.toggle_music(self.options_window),
-            **button_style
-        )
-        self.music_button.place(x=x_position, y=start_y, 
-                              width=button_width, height=button_height)
+    def hide(self):
+        self.active = False
+        self.game.reset_input()
+        self.main_frame.pack_forget()
 
-        self.sound_button = tk.Button(
-            self.options_window,
-            image=self.volume_on_image if self.sound_enabled else self.volume_off_image,
-            command=lambda: self.toggle_sound(self.options_window),
-            **button_style
-        )
-        self.sound_button.place(x=x_position, y=start_y + button_height + button_spacing, 
-                              width=button_width, height=button_height)
-        
-        try:
-            replay_img = Image.open("images/replay_button.png")
-            replay_img = replay_img.resize((button_width, button_height), Image.LANCZOS)
-            self.replay_photo_options = ImageTk.PhotoImage(replay_img)
-            has_replay_image = True
-        except FileNotFoundError:
-            print("Replay button image not found, using text button")
-            self.replay_photo_options = None
-            has_replay_image = False
-            
-        self.replay_button = tk.Button(
-            self.options_window,
-            image=self.replay_photo_options if has_replay_image else None,
-            text="Replay" if not has_replay_image else "",
-            font=("Arial", 14, "bold") if not has_replay_image else None,
-            fg='white' if not has_replay_image else None,
-            command=self.restart_game_from_options,
-            **button_style
-        )
-        self.replay_button.place(x=x_position, 
-                               y=start_y + 2 * (button_height + button_spacing),
-                               width=button_width, 
-                               height=button_height)
+    def new_game(self, music_enabled, sound_enabled):
+        self.music_enabled = music_enabled
+        self.sound_enabled = sound_enabled
+        self.restart_game()
 
-        self.options_window.protocol("WM_DELETE_WINDOW", lambda: self.close_options(self.options_window))
+    def show_options(self):
+        self.paused = True
+        self.loop.stop()
+        self.game.reset_input()
+        self.music_player.pause()
+        self.manager.show('options', self, replay=True)
 
-    def close_options(self, options_window):
-        options_window.destroy()
+    def close_options(self):
+        self.manager.show('game')
         self.paused = False
-        if self.music_enabled and not self.game_over:
+        if self.music_enabled and not self.engine.game_over:
             self.music_player.play()
-        self.update()
+        if not self.engine.game_over:
+            self.loop.start()
 
-    def toggle_music(self, options_window):
+    def toggle_music(self):
         self.music_enabled = not self.music_enabled
-        self.music_button.config(image=self.music_on_image if self.music_enabled else self.music_off_image)
         
         if self.music_enabled:
             self.music_player.play()
         else:
             self.music_player.pause()
-            
-        options_window.focus_set()
 
-    def toggle_sound(self, options_window):
+    def toggle_sound(self):
         self.sound_enabled = not self.sound_enabled
-        self.sound_button.config(image=self.volume_on_image if self.sound_enabled else self.volume_off_image)
-        options_window.focus_set()
 
     def restart_game_from_options(self):
-        if hasattr(self, 'options_window') and self.options_window.winfo_exists():
-            self.options_window.destroy()
+        self.manager.show('game')
         self.restart_game()
 
     def restart_game(self):
+        from replay import ReplayRecorder
+        
         self.music_player.stop()
-            
-        self.board = [[0] * WIDTH for _ in range(HEIGHT)]
-        self.current_piece = self.new_piece()
-        self.game_over = False
-        self.score = 0
+        self.end_session()
+        
+        self.recorder = ReplayRecorder()
+        self.game.restart(recorder=self.recorder)
+        self.session_recorded = False
         self.update_score()
         self.paused = False
 
-        if hasattr(self, 'restart_button'):
-            self.restart_button.destroy()
-        if hasattr(self, 'menu_button'):
-            self.menu_button.destroy()
+        self.restart_button.place_forget()
+        self.menu_button.place_forget()
 
         if self.music_enabled:
             self.music_player.play()
 
-        self.canvas.delete("all")
-        self.draw_board()
-        self.update()
+        self.draw_board(full=True)
+        self.loop.start()
+
+    def export_latency(self):
+        from profiler import LatencyTracer
+        
+        # Законченная сессия больше не пополняется, поэтому её трассировщик
+        # целиком уходит фоновому потоку. На диске остаются последние
+        # LATENCY_EXPORTS сессий.
+        tracer = self.latency
+        self.latency = LatencyTracer()
+        if not tracer.samples:
+            return
+
+        def export():
+            try:
+                file_path = tracer.export(PROFILE_DIR, LATENCY_EXPORTS)
+            except OSError as e:
+                print(f"Ошибка сохранения задержек: {e}")
+                return
+            print(f"Задержки ввода сохранены: {file_path}.csv, {file_path}.json")
+
+        load_writer().submit(export)
 
     def return_to_menu(self):
+        self.loop.stop()
+        self.end_session()
+        self.export_latency()
         self.music_player.stop()
-        self.root.destroy()
         self.return_to_menu_callback()
 
-    def on_close(self):
+    def close(self):
+        self.loop.stop()
+        self.end_session()
+        self.export_latency()
         self.music_player.stop()
-        self.root.destroy()
 
-    def update(self):
-        if not self.game_over and not self.paused:
-            if self.fast_fall:
-                if not self.check_collision(self.current_piece, dy=1):
-                    self.current_piece['y'] += 1
-                    self.draw_board()
-                    self.root.after(50, self.update)
-                    return
-                else:
-                    self.merge_piece()
-                    if self.game_over:
-                        return
-            else:
-                if not self.check_collision(self.current_piece, dy=1):
-                    self.current_piece['y'] += 1
-                    self.draw_board()
-                else:
-                    self.merge_piece()
-                    if self.game_over:
-                        return
-            
-            self.root.after(1000 // FPS, self.update)
+    def toggle_autoplay(self):
+        if self.autopilot is not None:
+            stats = self.autopilot.searcher.table.stats()
+            self.autopilot = None
+            print(f"Автоигра выключена: в кэше {stats['entries']} позиций, "
+                  f"попаданий {stats['hit_rate']:.0%}, вытеснено {stats['evictions']}")
+            return
+        from lookahead import Autopilot, get_searcher
+        self.autopilot = Autopilot(get_searcher(self.engine.width, self.engine.height))
+        print("Автоигра включена")
+
+    def tick(self):
+        if self.paused:
+            return
+        
+        start = time.perf_counter()
+        if self.autopilot is not None:
+            key = self.autopilot.next_key(self.engine)
+            if key is not None:
+                self.game.key_press(key)
+                self.game.key_release(key)
+        self.game.tick()
+        self.profiler.record('update', time.perf_counter() - start)
+
+    def render_frame(self):
+        if self.game.dirty:
+            self.game.dirty = False
+            self.draw_board()
+        if self.game.traced:
+            self.canvas.update_idletasks()
+            flushed = time.monotonic()
+            for action, stamp in self.game.traced:
+                self.latency.record(action, stamp, flushed)
+            self.game.traced.clear()
+        self.update_overlay()
 
 class MainMenu:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Tetris Main Menu")
-        self.root.geometry("400x750")
+    def __init__(self, manager, game_options=None):
+        self.manager = manager
+        self.root = manager.root
+        self.title = "Tetris Main Menu"
+        self.game_options = game_options or {}
+        self.game = None
+        self.visible = False
         
         self.music_enabled = True
         self.sound_enabled = True
         
-        self.music_player = MusicPlayer()
-        self.music_player.load("sounds/menu_music.wav")
-        self.music_player.set_loop(True)
-        if self.music_enabled:
-            self.music_player.play()
+        self.music_player = load_audio().track("sounds/menu_music.wav")
         
-        self.load_images()
         self.setup_ui()
 
     def load_images(self):
+        # Вызывается после первой отрисовки: до этого меню показывает
+        # заглушку без картинок.
         try:
-            menu_bg_image = Image.open("images/menu_background.jpg")
-            self.menu_bg_photo = ImageTk.PhotoImage(menu_bg_image.resize((400, 750)))
-            
-            play_img = Image.open("images/play_button.png")
-            self.play_photo = ImageTk.PhotoImage(play_img.resize((300, 75)))
+            self.menu_bg_photo = image_cache.get("images/menu_background.jpg", (400, 750))
             
-            options_img = Image.open("images/options_button.png")
-            self.options_photo = ImageTk.PhotoImage(options_img.resize((300, 75)))
+            self.play_photo = image_cache.get("images/play_button.png", (300, 75))
             
-            self.music_on_image = ImageTk.PhotoImage(Image.open("images/music_button_on.jpg").resize((300, 75), Image.LANCZOS))
-            self.music_off_image = ImageTk.PhotoImage(Image.open("images/music_button_off.jpg").resize((300, 75), Image.LANCZOS))
-            self.volume_on_image = ImageTk.PhotoImage(Image.open("images/volume_button_on.jpg").resize((300, 75), Image.LANCZOS))
-            self.volume_off_image = ImageTk.PhotoImage(Image.open("images/volume_button_off.jpg").resize((300, 75), Image.LANCZOS))
+            self.options_photo = image_cache.get("images/options_button.png", (300, 75))
             
         except FileNotFoundError as e:
             print(f"Ошибка загрузки изображений: {e}")
             self.create_fallback_images()
+        
+        self.menu_canvas.itemconfig(self.bg_item, image=self.menu_bg_photo)
+        self.play_button.config(image=self.play_photo, text="")
+        self.options_button.config(image=self.options_photo, text="")
 
     def create_fallback_images(self):
         self.menu_bg_photo = ImageTk.PhotoImage(Image.new('RGB', (400, 750), 'black'))
         self.play_photo = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'green'))
         self.options_photo = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'blue'))
-        self.music_on_image = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'green'))
-        self.music_off_image = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'red'))
-        self.volume_on_image = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'blue'))
-        self.volume_off_image = ImageTk.PhotoImage(Image.new('RGB', (300, 75), 'gray'))
 
     def setup_ui(self):
-        self.menu_canvas = tk.Canvas(self.root, width=400, height=750)
-        self.menu_canvas.create_image(0, 0, anchor=tk.NW, image=self.menu_bg_photo)
+        self.frame = tk.Frame(self.root)
+        
+        self.menu_canvas = tk.Canvas(self.frame, width=400, height=750, bg='black')
+        self.bg_item = self.menu_canvas.create_image(0, 0, anchor=tk.NW)
+        self.menu_canvas.create_text(200, 200, text="TETRIS", font=("Arial", 48, "bold"), fill="#FFFFFF")
+        self.leaderboard_text = self.menu_canvas.create_text(
+            200, 390, text="", font=("Arial", 16, "bold"), fill="#FFFFFF", justify=tk.CENTER
+        )
         self.menu_canvas.pack()
         
         self.play_button = tk.Button(
-            self.root,
-            image=self.play_photo,
+            self.frame,
+            text="PLAY",
+            font=("Arial", 24, "bold"),
+            fg="white",
             command=self.start_tetris,
             borderwidth=0,
             bg="black",
             activebackground="black"
         )
-        self.play_button.place(x=51, y=540)
+        self.play_button.place(x=51, y=540, width=300, height=75)
         
         self.options_button = tk.Button(
-            self.root,
-            image=self.options_photo,
+            self.frame,
+            text="OPTIONS",
+            font=("Arial", 24, "bold"),
+            fg="white",
             command=self.show_options,
             borderwidth=0,
             bg="black",
             activebackground="black"
         )
-        self.options_button.place(x=51, y=640)
+        self.options_button.place(x=51, y=640, width=300, height=75)
 
-    def start_tetris(self):
-        self.music_player.stop()
-        
-        tetris_root = tk.Toplevel(self.root)
-        game = Tetris(tetris_root, self.music_enabled, self.sound_enabled, self.show_main_menu)
-        
-        self.root.withdraw()
-        
-        tetris_root.protocol("WM_DELETE_WINDOW", self.on_close_game)
-
-    def on_close_game(self):
+    def show(self):
+        self.frame.pack(fill=tk.BOTH, expand=True)
+        self.visible = True
+        self.show_leaderboard()
         if self.music_enabled:
             self.music_player.play()
-        self.root.deiconify()
 
-    def show_options(self):
-        self.options_window = tk.Toplevel(self.root)
-        self.options_window.title("Options")
-        self.options_window.geometry("400x750")
+    def hide(self):
+        self.visible = False
+        self.frame.pack_forget()
 
-        try:
-            options_bg_image = Image.open("images/options_background.jpg")
-            options_bg_image = options_bg_image.resize((400, 750))
-            self.options_bg_photo = ImageTk.PhotoImage(options_bg_image)
-        except FileNotFoundError:
-            self.options_bg_photo = ImageTk.PhotoImage(Image.new('RGB', (400, 750), 'black'))
-
-        self.options_canvas = tk.Canvas(self.options_window, width=400, height=750)
-        self.options_canvas.create_image(0, 0, anchor=tk.NW, image=self.options_bg_photo)
-        self.options_canvas.pack()
+    def show_leaderboard(self):
+        # Таблица читается копией из хранилища. Пока оно грузится или
+        # дописывает только что законченную партию, меню перечитывает её.
+        if not self.visible:
+            return
+        store = load_score_store()
+        lines = [f"{place}. {entry['score']}  ({entry['lines']} л.)"
+                 for place, entry in enumerate(store.top()[:LEADERBOARD_SHOWN], start=1)]
+        text = "Рекорды\n" + "\n".join(lines) if lines else ""
+        self.menu_canvas.itemconfig(self.leaderboard_text, text=text)
+        if store.busy():
+            self.root.after(200, self.show_leaderboard)
 
-        try:
-            exit_img = Image.open("images/exit.png")
-            exit_img = exit_img.resize((100, 25))
-            self.exit_photo_options = ImageTk.PhotoImage(exit_img)
-        except FileNotFoundError:
-            self.exit_photo_options = None
-            
-        self.exit_button = tk.Button(
-            self.options_window,
-            image=self.exit_photo_options if self.exit_photo_options else None,
-            text="Exit" if not self.exit_photo_options else "",
-            font=("Arial", 12),
-            command=self.options_window.destroy,
-            bg="red" if not self.exit_photo_options else "black",
-            fg="white",
-            borderwidth=0
-        )
-        self.exit_button.place(x=10, y=13)
+    def close(self):
+        self.music_player.stop()
 
-        button_width = 300
-        button_height = 75
-        x_position = (400 - button_width) // 2
-        min_spacing = 30
-        
-        total_buttons_height = 2 * button_height + min_spacing
-        start_y = (750 - total_buttons_height) // 2 + 50
-        
-        music_button_y = start_y
+    def start_tetris(self):
+        # Музыка меню затухает, пока вступает музыка игры.
+        self.music_player.stop(fade=True)
         
-        self.music_button = tk.Button(
-            self.options_window,
-            image=self.music_on_image if self.music_enabled else self.music_off_image,
-            command=lambda: self.toggle_music(self.options_window),
-            borderwidth=0,
-            width=button_width,
-            height=button_height,
-            bg='black'
-        )
-        self.music_button.place(x=x_position, y=music_button_y, 
-                              width=button_width, height=button_height)
+        # Игра создаётся один раз, следующие партии сбрасывают её на месте.
+        if self.game is None:
+            self.game = Tetris(self.manager, self.music_enabled, self.sound_enabled, self.show_main_menu, **self.game_options)
+            self.manager.add('game', self.game)
+        self.manager.show('game')
+        self.game.new_game(self.music_enabled, self.sound_enabled)
 
-        self.sound_button = tk.Button(
-            self.options_window,
-            image=self.volume_on_image if self.sound_enabled else self.volume_off_image,
-            command=lambda: self.toggle_sound(self.options_window),
-            borderwidth=0,
-            width=button_width,
-            height=button_height,
-            bg='black'
-        )
-        sound_button_y = music_button_y + button_height + min_spacing
-        self.sound_button.place(x=x_position, y=sound_button_y, 
-                              width=button_width, height=button_height)
+    def show_options(self):
+        self.manager.show('options', self)
+
+    def close_options(self):
+        self.manager.show('menu')
 
-    def toggle_music(self, options_window):
+    def toggle_music(self):
         self.music_enabled = not self.music_enabled
-        self.music_button.config(image=self.music_on_image if self.music_enabled else self.music_off_image)
         
         if self.music_enabled:
             self.music_player.play()
         else:
             self.music_player.pause()
-            
-        options_window.focus_set()
 
-    def toggle_sound(self, options_window):
+    def toggle_sound(self):
         self.sound_enabled = not self.sound_enabled
-        self.sound_button.config(image=self.volume_on_image if self.sound_enabled else self.volume_off_image)
-        options_window.focus_set()
 
     def show_main_menu(self):
-        self.root.deiconify()
-        if hasattr(self, 'tetris_root'):
-            self.tetris_root.destroy()
-        if self.music_enabled:
-            self.music_player.play()
-
-def update_file_paths():
-    try:
-        with open('tetris.py', 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        updated_content = re.sub(
-            r'Image\.open\("((?!images/)(?!sounds/))([^"]+\.(?:png|jpg|jpeg))"\)',
-            r'Image.open("images/\2")',
-            content
-        )
-        
-        updated_content = re.sub(
-            r'play_sound\("([^"]+\.wav)"\)',
-            r'play_sound("sounds/\1")',
-            updated_content
-        )
-        
-        updated_content = re.sub(
-            r'pyglet\.media\.load\("([^"]+\.wav)"\)',
-            r'pyglet.media.load("sounds/\1")',
-            updated_content
-        )
-        
-        if updated_content != content:
-            with open('tetris.py', 'w', encoding='utf-8') as file:
-                file.write(updated_content)
-            print("Пути к файлам успешно обновлены!")
-            return True
-        return False
-    except Exception as e:
-        print(f"Ошибка при обновлении путей: {e}")
-        return False
+        self.music_enabled = self.game.music_enabled
+        self.sound_enabled = self.game.sound_enabled
+        self.manager.show('menu')
 
 if __name__ == "__main__":
+    import argparse
     import sys
-    import re
     
-    if len(sys.argv) > 1 and sys.argv[1] == "--update-paths":
-        if update_file_paths():
-            print("Файл tetris.py успешно обновлен с новыми путями.")
-        else:
-            print("Обновление путей не потребовалось или произошла ошибка.")
+    if len(sys.argv) > 1 and sys.argv[1] == "--build-assets":
+        bundle.main(sys.argv[2:])
+        sys.exit(0)
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "--simulate":
+        import simulate
+        simulate.main(sys.argv[2:])
+        sys.exit(0)
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "--soak":
+        import soak
+        sys.exit(soak.main(sys.argv[2:]))
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "--check-alloc":
+        import profiler
+        profiler.check_allocations(sys.argv[2:])
+        sys.exit(0)
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "--replay":
+        import replay
+        replay.main(sys.argv[2:])
         sys.exit(0)
     
+    parser = argparse.ArgumentParser(description="Tetris")
+    parser.add_argument('--renderer', choices=sorted(RENDERERS), default='canvas')
+    parser.add_argument('--board', default=f"{WIDTH}x{HEIGHT}", help="размер поля, например 100x200")
+    parser.add_argument('--profile-startup', action='store_true', help="вывести время этапов запуска")
+    args = parser.parse_args()
+    board_width, board_height = (int(value) for value in args.board.lower().split('x'))
+    
+    startup = None
+    if args.profile_startup:
+        from profiler import StartupTimer
+        startup = StartupTimer(STARTED)
+        startup.mark('imports')
+    
+    start_prefetch(startup)
+    
     root = tk.Tk()
-    menu = MainMenu(root)
-    root.mainloop()
\ No newline at end of file
+    manager = SceneManager(root)
+    menu = MainMenu(manager, {'width': board_width, 'height': board_height, 'renderer': args.renderer})
+    manager.add('menu', menu)
+    manager.add_lazy('options', OptionsScene)
+    manager.show('menu')
+    if startup:
+        startup.mark('window')
+    
+    # Заглушка меню попадает на экран раньше, чем декодируются картинки.
+    root.update()
+    if startup:
+        startup.mark('first paint')
+    
+    def report_startup():
+        # Фоновые этапы попадают в отчёт, когда закончатся, но ждём не
+        # дольше пяти секунд.
+        waiting = audio.backend_time is None or 'prefetch' not in startup.background
+        if waiting and time.perf_counter() - startup.last < 5:
+            root.after(50, report_startup)
+            return
+        if audio.backend_time is not None:
+            startup.record('audio', audio.backend_time)
+        print(startup.report())
+    
+    def finish_startup():
+        menu.load_images()
+        if startup:
+            startup.mark('menu assets')
+            report_startup()
+    
+    root.after(0, finish_startup)
+    root.mainloop()
+    
+    if audio is not None:
+        audio.close()
+    if score_store is not None:
+        score_store.close()
+    if writer is not None:
+        writer.close()
\ No newline at end of file
@@ -0,0 +1,42 @@
+import pyglet.media
+from pyglet.media.codecs import AudioData, AudioFormat
+
+
+class WaveStream(pyglet.media.StreamingSource):
+    # При loop=True конец файла сразу продолжается началом в том же буфере,
+    # поэтому петля не зависит от on_eos и не даёт паузы.
+    def __init__(self, wave_data, loop=True):
+        self.wave = wave_data
+        self.audio_format = AudioFormat(wave_data.channels, wave_data.sample_size, wave_data.sample_rate)
+        self._duration = wave_data.duration
+        self.loop = loop
+        self.position = 0
+
+    def seek(self, timestamp):
+        position = int(timestamp * self.audio_format.bytes_per_second)
+        position -= position % self.wave.block_align
+        self.position = min(max(0, position), len(self.wave.data))
+
+    def get_audio_data(self, num_bytes, compensation_time=0.0):
+        data = self.wave.data
+        size = len(data)
+        num_bytes = int(num_bytes) - int(num_bytes) % self.wave.block_align or self.wave.block_align
+        if not size or (self.position >= size and not self.loop):
+            return None
+
+        timestamp = self.position / self.audio_format.bytes_per_second
+        chunks = []
+        remaining = num_bytes
+        while remaining:
+            if self.position >= size:
+                if not self.loop:
+                    break
+                self.position = 0
+            take = min(remaining, size - self.position)
+            chunks.append(data[self.position:self.position + take])
+            self.position += take
+            remaining -= take
+
+        buffer = b''.join(chunks)
+        duration = len(buffer) / self.audio_format.bytes_per_second
+        return AudioData(buffer, len(buffer), timestamp, duration)